@@ -0,0 +1,22 @@
+import os
+from typing import List
+from agents import Agent, Runner
+
+# Small, cheap model: the summary only has to keep facts, not sound nice
+SUMMARY_MODEL = os.getenv("LYRA_SUMMARY_MODEL", "gpt-4o-mini")
+
+summary_agent = Agent(
+    name="Summary Agent",
+    instructions=("Fasse den bisherigen Gesprächsverlauf zwischen User und Assistant knapp zusammen, höchstens 120 Wörter. "
+            "Behalte konkrete Fakten: Namen, Termine mit Datum und Uhrzeit, Listen und Aufgaben, offene Rückfragen und Entscheidungen. "
+            "Lass Begrüßungen und Wiederholungen weg. Antworte nur mit der Zusammenfassung, in der Sprache des Gesprächs."),
+    model=SUMMARY_MODEL
+)
+
+
+async def summarize_turns(summary: str, lines: List[str]) -> str:
+    # Fold older turns into the running summary
+    earlier = f"Bisherige Zusammenfassung: {summary}\n\n" if summary else ""
+    transcript = "\n".join(lines)
+    result = await Runner.run(summary_agent, f"{earlier}Neue Turns:\n{transcript}")
+    return str(result.final_output).strip()
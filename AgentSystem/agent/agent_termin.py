@@ -1,42 +1,74 @@
 ### agent/agent_runner.py
 from agents import Agent, function_tool, Runner
 from calendar_logic.event_manager import EventManager
-from calendar_logic.models import EventDetails, ModifyEventParams, EventListParams, DeleteEventParams
+from calendar_logic.models import EventDetails, ModifyEventParams, EventListParams, DeleteEventParams, AvailabilityParams, FreeSlotParams, CreateEventsParams, DeleteEventsParams
 from tools.context_manager import ContextManager
 from typing import Optional
 import datetime
 
 # Initialize the EventManager
 event_manager = EventManager()
-context_manager = ContextManager()
 
 @function_tool
-def create_final_event(event: EventDetails) -> str:
+async def create_final_event(event: EventDetails) -> str:
     """
     Creates a new event in Google Calendar. Ensure the current date is used as a reference.
     """
-    return event_manager.create_final_event(event)
+    return await event_manager.create_final_event(event)
 
 @function_tool
-def modify_existing_event(params: ModifyEventParams) -> str:
+async def modify_existing_event(params: ModifyEventParams) -> str:
     """
     Modifies an existing event in Google Calendar based on a search term in the title and a time range.
     """
-    return event_manager.modify_event(params)
+    return await event_manager.modify_event(params)
 
 @function_tool
-def delete_event(params: DeleteEventParams) -> str:
+async def delete_event(params: DeleteEventParams) -> str:
     """
     Deletes an event in Google Calendar based on a search term in the title and a time range.
     """
-    return event_manager.delete_event(params)
+    return await event_manager.delete_event(params)
 
 @function_tool
-def list_events(params: EventListParams) -> str:
+async def create_events(params: CreateEventsParams) -> str:
+    """
+    Creates several events in Google Calendar with a single request, e.g. "three appointments next week".
+    Reports the result for every event.
+    """
+    return await event_manager.create_events(params)
+
+@function_tool
+async def delete_events(params: DeleteEventsParams) -> str:
+    """
+    Deletes all events in a time range whose title clearly matches the search term (or the given IDs)
+    with a single request, e.g. "delete all my gym sessions this month". When several events match the title,
+    they are only listed: confirm them with the user, then call again with their event_ids.
+    Reports the result for every event.
+    """
+    return await event_manager.delete_events(params)
+
+@function_tool
+async def list_events(params: EventListParams) -> str:
     """
     Lists events within a specified time range, optionally filtered by color, title, and count.
     """
-    return event_manager.list_events(params)
+    return await event_manager.list_events(params)
+
+@function_tool
+async def check_availability(params: AvailabilityParams) -> str:
+    """
+    Checks whether a time range is free and lists the conflicting events otherwise.
+    Use this before creating an event or to answer questions like "is Thursday 3pm free?".
+    """
+    return await event_manager.check_availability(params)
+
+@function_tool
+async def find_free_slot(params: FreeSlotParams) -> str:
+    """
+    Finds the next free slot of the given length, within the allowed hours of each day.
+    """
+    return await event_manager.find_free_slot(params)
 
 @function_tool
 def get_current_time(format: Optional[str] = None) -> str:
@@ -55,11 +87,13 @@ appointment_agent = Agent(
             "Achte auf die Verwendung des aktuellen Datums bei Terminen."
             "Trage den termin erst endgültig ein wenn du terminname und Uhrzeit hast."),           
     handoff_description="Agent for handling appointments and reminders.",
-    tools=[create_final_event, modify_existing_event, delete_event, list_events, get_current_time],
+    tools=[create_final_event, modify_existing_event, delete_event, create_events, delete_events, list_events, check_availability, find_free_slot, get_current_time],
     model="gpt-4o"
 )
 
 async def run_agent_termin():
+    # Eigener Kontext pro Konsolen-Sitzung
+    context_manager = ContextManager()
     print("Termin Agent gestartet. Du kannst jederzeit mit 'exit' beenden.")
     while True:
         user_input = input("Du: ")
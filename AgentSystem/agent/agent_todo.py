@@ -1,63 +1,120 @@
 ### agent/agent_runner.py
 from agents import Agent, function_tool, Runner
 from todo_logic.todo_manager import TaskManager
-from todo_logic.models import TodoDetails, ModifyTodoParams, TaskListParams, DeleteTodoParams
+from todo_logic.models import TodoDetails, ModifyTodoParams, TaskListParams, DeleteTodoParams, SearchTodoParams, CreateTodosParams, \
+    TodoByNameParams, CreateTodoInListParams, ModifyTodoByNameParams, ListTodosByNameParams, DueTodosParams
 from tools.context_manager import ContextManager
 from typing import Optional
 import datetime
 
 # Initialize the TaskManager
 task_manager = TaskManager()
-context_manager = ContextManager()
 
 @function_tool
-def create_todo(todo: TodoDetails) -> str:
+async def create_todo(todo: TodoDetails) -> str:
     """
     Creates a new to-do task.
     """
-    return task_manager.create_todo(todo)
+    return await task_manager.create_todo(todo)
 
 @function_tool
-def modify_todo(params: ModifyTodoParams) -> str:
+async def create_todos(params: CreateTodosParams) -> str:
+    """
+    Creates several to-do tasks with a single request and reports the result for every task.
+    """
+    return await task_manager.create_todos(params)
+
+@function_tool
+async def modify_todo(params: ModifyTodoParams) -> str:
     """
     Modifies an existing to-do task.
     """
-    return task_manager.modify_todo(params)
+    return await task_manager.modify_todo(params)
 
 @function_tool
-def delete_todo(params: DeleteTodoParams) -> str:
+async def delete_todo(params: DeleteTodoParams) -> str:
     """
     Deletes a to-do task.
     """
-    return task_manager.delete_todo(params)
+    return await task_manager.delete_todo(params)
 
 @function_tool
-def list_todos(params: TaskListParams) -> str:
+async def list_todos(params: TaskListParams) -> str:
     """
     Lists all tasks in a specific task list.
     """
-    return task_manager.list_todos(params)
+    return await task_manager.list_todos(params)
+
+@function_tool
+async def search_todos(params: SearchTodoParams) -> str:
+    """
+    Finds tasks in a task list by (part of) their title, ranked by similarity.
+    Use it to get the task ID for modify_todo or delete_todo.
+    """
+    return await task_manager.search_todos(params)
+
+@function_tool
+async def create_todo_in_list(params: CreateTodoInListParams) -> str:
+    """
+    Creates a task in a task list given by its name (default list if omitted), no IDs needed.
+    """
+    return await task_manager.create_todo_in_list(params)
+
+@function_tool
+async def list_todos_in_list(params: ListTodosByNameParams) -> str:
+    """
+    Lists the tasks of a task list given by its name (default list if omitted).
+    """
+    return await task_manager.list_todos_in_list(params)
+
+@function_tool
+async def modify_todo_by_name(params: ModifyTodoByNameParams) -> str:
+    """
+    Modifies a task found by its name in a list given by its name, in a single step.
+    """
+    return await task_manager.modify_todo_by_name(params)
+
+@function_tool
+async def complete_todo_by_name(params: TodoByNameParams) -> str:
+    """
+    Marks an open task as completed, found by its name in a list given by its name.
+    """
+    return await task_manager.complete_todo_by_name(params)
+
+@function_tool
+async def delete_todo_by_name(params: TodoByNameParams) -> str:
+    """
+    Deletes a task found by its name in a list given by its name.
+    """
+    return await task_manager.delete_todo_by_name(params)
+
+@function_tool
+async def list_due_todos(params: DueTodosParams) -> str:
+    """
+    Lists the open tasks of all task lists that are due by a date (today if omitted), including overdue ones.
+    """
+    return await task_manager.list_due_todos(params)
 
 @function_tool
-def create_tasklist(title: str) -> str:
+async def create_tasklist(title: str) -> str:
     """
     Creates a new task list.
     """
-    return task_manager.create_tasklist(title)
+    return await task_manager.create_tasklist(title)
 
 @function_tool
-def delete_tasklist(tasklist_id: str) -> str:
+async def delete_tasklist(tasklist_id: str) -> str:
     """
     Deletes a task list by its ID.
     """
-    return task_manager.delete_tasklist(tasklist_id)
+    return await task_manager.delete_tasklist(tasklist_id)
 
 @function_tool
-def list_tasklists() -> str:
+async def list_tasklists() -> str:
     """
     Lists all existing task lists.
     """
-    return task_manager.list_tasklists()
+    return await task_manager.list_tasklists()
 
 @function_tool
 def get_current_time(format: Optional[str] = None) -> str:
@@ -82,13 +139,17 @@ def get_current_time(format: Optional[str] = None) -> str:
 todo_agent = Agent(
     name="ToDo Agent",
     handoff_description="Agent for handling toDo.",
-    instructions="Agent zur Erstellung, Auflistung, Änderung und Löschung von ToDos und Aufgabenlisten. Achte auf die Verwendung des aktuellen Datums bei Aufgaben." 
+    instructions="Agent zur Erstellung, Auflistung, Änderung und Löschung von ToDos und Aufgabenlisten. Achte auf die Verwendung des aktuellen Datums bei Aufgaben. "
+                "Nutze bevorzugt die Tools mit Listen- und Aufgabennamen, dann sind keine IDs nötig. "
                 "Antworte möglichst kurz",
-    tools=[create_todo, modify_todo, delete_todo, list_todos, create_tasklist, delete_tasklist, list_tasklists, get_current_time],
+    tools=[create_todo_in_list, list_todos_in_list, modify_todo_by_name, complete_todo_by_name, delete_todo_by_name, list_due_todos,
+           create_todo, create_todos, modify_todo, delete_todo, list_todos, search_todos, create_tasklist, delete_tasklist, list_tasklists, get_current_time],
     model="gpt-4o"
 )
 
 async def run_agent_todo():
+    # Eigener Kontext pro Konsolen-Sitzung
+    context_manager = ContextManager()
     print("ToDo Agent gestartet. Du kannst jederzeit mit 'exit' beenden.")
     while True:
         user_input = input("Du: ")
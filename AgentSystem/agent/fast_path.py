@@ -0,0 +1,135 @@
+import re
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional
+from calendar_logic.event_manager import EventManager
+from calendar_logic.event_store import CALENDAR_TIMEZONE, parse_event_time
+from todo_logic.todo_manager import TaskManager
+from tools.title_index import tokenize
+
+WEEKDAYS_DE = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag", "Samstag", "Sonntag"]
+MONTHS_DE = ["Januar", "Februar", "März", "April", "Mai", "Juni", "Juli", "August", "September", "Oktober", "November", "Dezember"]
+# Longer answers are better left to the agent
+MAX_SPOKEN_ITEMS = 8
+
+# Optional wake words in front of a command
+PREFIX = r"^(?:(?:hey|hallo|ok|okay) )?(?:lyra )?"
+
+# (name, intent, language, pattern) over the normalized transcript: lower case, no accents, no punctuation
+TEMPLATES = [
+    ("time", "general", "de", PREFIX + r"(?:wie spat ist es|wie viel uhr ist es|wieviel uhr ist es|wie spat)(?: gerade| jetzt)?$"),
+    ("time", "general", "en", PREFIX + r"(?:what time is it|what s the time|what is the time)(?: now| right now)?$"),
+    ("date", "general", "de", PREFIX + r"(?:welcher tag ist heute|welches datum (?:ist|haben wir)(?: heute)?|der wievielte ist heute|den wievielten haben wir(?: heute)?)$"),
+    ("date", "general", "en", PREFIX + r"(?:what day is (?:it|today)|what s the date(?: today)?|what is the date(?: today)?|what s today s date|what is today s date)$"),
+    ("events", "appointment", "de", PREFIX + r"(?:was steht|was habe ich|was hab ich|welche termine habe ich|welche termine hab ich)(?: denn)? (?P<day>heute|morgen)(?: so)?(?: an| vor| im kalender| in meinem kalender)?$"),
+    ("events", "appointment", "de", PREFIX + r"(?:meine |welche )?termine (?:fur )?(?P<day>heute|morgen)$"),
+    ("events", "appointment", "en", PREFIX + r"(?:what s|what is|what do i have) (?:on )?(?:my calendar |my schedule |the agenda )?(?:for )?(?P<day>today|tomorrow)$"),
+    ("list", "todo", "de", PREFIX + r"(?:zeig(?: mir)?|was steht auf|lies(?: mir)?) (?:meine |meiner |die |der )?(?P<name>\w*liste)(?: vor)?$"),
+    ("list", "todo", "de", PREFIX + r"(?:zeig(?: mir)?|lies(?: mir)?|was sind) (?:meine|die) (?:aufgaben|todos|to dos)(?: vor)?$"),
+    ("list", "todo", "en", PREFIX + r"(?:show(?: me)?|read(?: me)?|what s on|what is on) (?:my |the )?(?P<name>[a-z ]+?) list$"),
+    ("list", "todo", "en", PREFIX + r"(?:show(?: me)?|read(?: me)?|what are) my (?:tasks|todos|to dos)$"),
+]
+
+
+class FastAnswer(NamedTuple):
+    template: str
+    intent: str  # Specialist the question belongs to, for follow-ups
+    text: str
+
+
+def _join(items: List[str], language: str) -> str:
+    if len(items) == 1:
+        return items[0]
+    return ", ".join(items[:-1]) + (" und " if language == "de" else " and ") + items[-1]
+
+
+class FastPathEngine:
+    """
+    Answers a small set of trivial questions (time, date, today's or tomorrow's events,
+    reading out a list) directly from the local calendar and task mirrors, without any LLM call.
+    Anything that does not match a template exactly, or would need a longer answer, returns None
+    and goes to the agents as usual. Templates only read, nothing is ever changed here.
+    """
+
+    def __init__(self, event_manager: EventManager, task_manager: TaskManager, now: Callable[[], datetime] = None):
+        self.event_manager = event_manager
+        self.task_manager = task_manager
+        self.now = now or (lambda: datetime.now(CALENDAR_TIMEZONE))
+        self.templates = [(name, intent, language, re.compile(pattern)) for name, intent, language, pattern in TEMPLATES]
+
+    async def answer(self, text: str) -> Optional[FastAnswer]:
+        normalized = " ".join(tokenize(text))
+        for name, intent, language, pattern in self.templates:
+            match = pattern.match(normalized)
+            if not match:
+                continue
+            try:
+                reply = await getattr(self, f"_answer_{name}")(match, language)
+            except Exception as e:
+                print(f"⚠️ Fast Path '{name}' fehlgeschlagen:", str(e))
+                return None
+            if reply is None:
+                return None
+            print(f"⚡ Fast Path: {name} ({language})")
+            return FastAnswer(name, intent, reply)
+        return None
+
+    async def _answer_time(self, match, language: str) -> str:
+        now = self.now()
+        if language == "de":
+            return f"Es ist {now.hour}:{now.minute:02d} Uhr."
+        return f"It's {now.strftime('%I:%M %p').lstrip('0')}."
+
+    async def _answer_date(self, match, language: str) -> str:
+        now = self.now()
+        if language == "de":
+            return f"Heute ist {WEEKDAYS_DE[now.weekday()]}, der {now.day}. {MONTHS_DE[now.month - 1]} {now.year}."
+        return f"Today is {now.strftime('%A, %B')} {now.day}, {now.year}."
+
+    async def _answer_events(self, match, language: str) -> Optional[str]:
+        tomorrow = match.group("day") in ("morgen", "tomorrow")
+        day = (self.now() + timedelta(days=1 if tomorrow else 0)).date()
+        events = await self.event_manager.events_on(day)
+        if len(events) > MAX_SPOKEN_ITEMS:
+            return None
+
+        items = []
+        for event in events:
+            title = event.get("summary", "")
+            if "dateTime" not in event.get("start", {}):
+                items.append(f"ganztägig {title}" if language == "de" else f"{title} all day")
+                continue
+            start = parse_event_time(event["start"]).astimezone(CALENDAR_TIMEZONE)
+            if language == "de":
+                items.append(f"um {start.hour}:{start.minute:02d} Uhr {title}")
+            else:
+                items.append(f"{title} at {start.strftime('%I:%M %p').lstrip('0')}")
+
+        if language == "de":
+            when = "Morgen" if tomorrow else "Heute"
+            if not items:
+                return f"{when} hast du keine Termine."
+            count = "einen Termin" if len(items) == 1 else f"{len(items)} Termine"
+            return f"{when} hast du {count}: {_join(items, language)}."
+        when = "tomorrow" if tomorrow else "today"
+        if not items:
+            return f"You have nothing on your calendar {when}."
+        count = "one event" if len(items) == 1 else f"{len(items)} events"
+        return f"You have {count} {when}: {_join(items, language)}."
+
+    async def _answer_list(self, match, language: str) -> Optional[str]:
+        name = match.groupdict().get("name")
+        tasklist = await self.task_manager.find_tasklist(name)
+        if not tasklist:
+            return None  # Unknown or ambiguous list, the agent can ask back
+        tasks = await self.task_manager.open_tasks(tasklist["id"])
+        if len(tasks) > MAX_SPOKEN_ITEMS:
+            return None
+
+        titles = [task.get("title", "") for task in tasks]
+        if language == "de":
+            if not titles:
+                return f"Auf der Liste {tasklist['title']} steht nichts Offenes."
+            return f"Auf der Liste {tasklist['title']} steht: {_join(titles, language)}."
+        if not titles:
+            return f"There is nothing open on {tasklist['title']}."
+        return f"On {tasklist['title']}: {_join(titles, language)}."
@@ -1,70 +1,150 @@
 from tools.authentication import Authenticator
-from calendar_logic.models import EventDetails, ModifyEventParams, EventListParams, DeleteEventParams, ReminderModel
+from calendar_logic.event_store import EventStore, CALENDAR_TIMEZONE, parse_event_time, parse_local_time, parse_query_time
+from calendar_logic.interval_index import find_free_slot
+from tools.title_index import TitleIndex, pick_match
+from calendar_logic.models import EventDetails, ModifyEventParams, EventListParams, DeleteEventParams, ReminderModel, AvailabilityParams, FreeSlotParams, CreateEventsParams, DeleteEventsParams
+from tools.batch import execute_batch
+from tools.pagination import Paginator, thread_http
+from tools.async_transport import transport
 from typing import Optional
 from googleapiclient.errors import HttpError
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+import asyncio
+import itertools
+
+# Largest page events().list allows (its default is 250), so most ranges need one request
+PAGE_SIZE = 2500
+# Bulk deletes only take titles that match this well, so "Gym" does not also delete "Gymnastik"
+BULK_MATCH_SCORE = 0.7
 
 
 class EventManager:
     def __init__(self):
-        # Authenticate and initialize the Google Calendar service
-        self.service = Authenticator.authenticate("event")
+        # Local mirror that answers reads once the first sync is done.
+        # Nothing touches the network here, authentication and the first sync start on first use.
+        self.store = EventStore(lambda: Authenticator.authenticate("event"))
 
-    def modify_event(self, params: ModifyEventParams) -> str:
-        try:
-            # Format the start and end times for the event search
-            start_time = params.start_time + "Z"
-            end_time = params.end_time + "Z"
+    def start(self):
+        # Begin mirroring the calendar; called by the server warm-up or implicitly on first use
+        self.store.start()
 
-            # Search for the matching event
-            events_result = self.service.events().list(
+    @property
+    def service(self):
+        # For worker threads; Authenticator keeps one built service per thread
+        self.start()
+        return Authenticator.authenticate("event")
+
+    async def _service(self):
+        # For the event loop: built in a worker thread on first use, so loading the credentials never blocks it
+        self.start()
+        return await Authenticator.async_authenticate("event")
+
+    async def _find_events(self, start_time: str, end_time: str, max_results: Optional[int] = None) -> list:
+        # Events in the range from the local mirror, or from Google until the mirror is ready
+        if self.store.ready:
+            try:
+                events = self.store.events_between(parse_query_time(start_time), parse_query_time(end_time))
+                return events[:max_results] if max_results else events
+            except ValueError:
+                pass  # Unparseable range: let Google report the error as before
+
+        # The blocking paginated listing runs off the event loop
+        return await asyncio.to_thread(self._list_events_from_api, start_time + "Z", end_time + "Z", max_results)
+
+    def _list_events_from_api(self, time_min: str, time_max: str, max_results: Optional[int] = None) -> list:
+        # All events of the range across pages, stopping as soon as max_results are collected
+        page_size = min(max_results, PAGE_SIZE) if max_results else PAGE_SIZE
+        pages = Paginator(
+            lambda page_token: self.service.events().list(
                 calendarId='primary',
-                timeMin=start_time,
-                timeMax=end_time,
+                timeMin=time_min,
+                timeMax=time_max,
+                maxResults=page_size,
                 singleEvents=True,
-                orderBy="startTime"
-            ).execute()
-
-            events = events_result.get("items", [])
-
-            for event in events:
-                if params.search_name.lower() in event.get("summary", "").lower():
-                    # Event found: Prepare for update
-                    updated_event = event.copy()
-
-                    if params.new_summary:
-                        updated_event['summary'] = params.new_summary
-                    if params.new_start_time:
-                        updated_event['start'] = {'dateTime': params.new_start_time, 'timeZone': 'Europe/Berlin'}
-                    if params.new_end_time:
-                        updated_event['end'] = {'dateTime': params.new_end_time, 'timeZone': 'Europe/Berlin'}
-                    if params.new_description:
-                        updated_event['description'] = params.new_description
-                    if params.new_location:
-                        updated_event['location'] = params.new_location
-                    if params.new_attendees:
-                        updated_event['attendees'] = [{'email': attendee} for attendee in params.new_attendees]
-                    if params.new_reminders:
-                        updated_event['reminders'] = {
-                            'useDefault': False,
-                            'overrides': [{'method': r.method, 'minutes': r.minutes} for r in params.new_reminders]
-                        }
-                    if params.new_recurrence:
-                        updated_event['recurrence'] = params.new_recurrence
-                    if params.new_color_id:
-                        updated_event['colorId'] = str(params.new_color_id)
-
-                    # Update the event in Google Calendar
-                    updated_event = self.service.events().update(
-                        calendarId='primary',
-                        eventId=event['id'],
-                        body=updated_event,
-                        sendUpdates='all'
-                    ).execute()
-
-                    return f"Event '{updated_event['summary']}' updated successfully."
-
-            return "No matching event found."
+                orderBy="startTime",
+                pageToken=page_token
+            ).execute(http=thread_http(self.service)),
+            # A single page is enough when it already holds max_results
+            prefetch=not max_results or max_results > PAGE_SIZE
+        )
+        return list(itertools.islice(pages, max_results)) if max_results else list(pages)
+
+    def _resolve_event(self, search_name: str, events: list, event_id: Optional[str] = None):
+        """
+        Picks the event meant by a search term among the events of the search window.
+        Returns (event, None) for a clear match, otherwise (None, message for the agent):
+        several similar titles are listed with their IDs instead of silently taking the first.
+        """
+        events_by_id = {event["id"]: event for event in events}
+        if event_id:
+            if event_id in events_by_id:
+                return events_by_id[event_id], None
+            return None, "No matching event found."
+
+        if self.store.ready:
+            ranked = self.store.search_titles(search_name, list(events_by_id))
+        else:
+            ranked = TitleIndex.from_items((event["id"], event.get("summary", "")) for event in events).search(search_name)
+
+        match, candidates = pick_match(ranked)
+        if match:
+            return events_by_id[match], None
+        if not candidates:
+            return None, "No matching event found."
+
+        candidate_list = [
+            f"- {events_by_id[key]['start'].get('dateTime', events_by_id[key]['start'].get('date'))} | "
+            f"{events_by_id[key].get('summary', '')} (ID: {key}, match: {score:.2f})"
+            for key, score in candidates
+        ]
+        return None, (f"Several events match '{search_name}'. Ask the user which one is meant, "
+                      "or repeat the call with its event_id:\n" + "\n".join(candidate_list))
+
+    async def modify_event(self, params: ModifyEventParams) -> str:
+        try:
+            service = await self._service()
+            # Search for the matching event
+            events = await self._find_events(params.start_time, params.end_time)
+
+            event, message = self._resolve_event(params.search_name, events, params.event_id)
+            if not event:
+                return message
+
+            # Event found: Prepare for update
+            updated_event = event.copy()
+
+            if params.new_summary:
+                updated_event['summary'] = params.new_summary
+            if params.new_start_time:
+                updated_event['start'] = {'dateTime': params.new_start_time, 'timeZone': 'Europe/Berlin'}
+            if params.new_end_time:
+                updated_event['end'] = {'dateTime': params.new_end_time, 'timeZone': 'Europe/Berlin'}
+            if params.new_description:
+                updated_event['description'] = params.new_description
+            if params.new_location:
+                updated_event['location'] = params.new_location
+            if params.new_attendees:
+                updated_event['attendees'] = [{'email': attendee} for attendee in params.new_attendees]
+            if params.new_reminders:
+                updated_event['reminders'] = {
+                    'useDefault': False,
+                    'overrides': [{'method': r.method, 'minutes': r.minutes} for r in params.new_reminders]
+                }
+            if params.new_recurrence:
+                updated_event['recurrence'] = params.new_recurrence
+            if params.new_color_id:
+                updated_event['colorId'] = str(params.new_color_id)
+
+            # Update the event in Google Calendar
+            updated_event = await transport.execute(service.events().update(
+                calendarId='primary',
+                eventId=event['id'],
+                body=updated_event,
+                sendUpdates='all'
+            ))
+            self.store.upsert(updated_event)
+
+            return f"Event '{updated_event['summary']}' updated successfully."
         except HttpError as error:
             return f"Error while modifying the event: {error}"
 
@@ -92,48 +172,43 @@ class EventManager:
         
 
 
-    def create_final_event(self, event: EventDetails) -> str:
+    @staticmethod
+    def _event_body(event: EventDetails) -> dict:
+        event_body = {
+            'summary': event.summary,
+            'start': {'dateTime': event.start_time, 'timeZone': 'Europe/Berlin'},
+            'end': {'dateTime': event.end_time, 'timeZone': 'Europe/Berlin'}
+        }
+
+        if event.description:
+            event_body['description'] = event.description
+        if event.location:
+            event_body['location'] = event.location
+        if event.attendees:
+            event_body['attendees'] = [{'email': attendee} for attendee in event.attendees]
+        return event_body
+
+    async def create_final_event(self, event: EventDetails) -> str:
         try:
-            event_body = {
-                'summary': event.summary,
-                'start': {'dateTime': event.start_time, 'timeZone': 'Europe/Berlin'},
-                'end': {'dateTime': event.end_time, 'timeZone': 'Europe/Berlin'}
-            }
-
-            if event.description:
-                event_body['description'] = event.description
-            if event.location:
-                event_body['location'] = event.location
-            if event.attendees:
-                event_body['attendees'] = [{'email': attendee} for attendee in event.attendees]
-
-            created_event = self.service.events().insert(
+            service = await self._service()
+            event_body = self._event_body(event)
+
+            created_event = await transport.execute(service.events().insert(
                 calendarId='primary',
                 body=event_body,
                 sendUpdates='all'
-            ).execute()
+            ))
+            self.store.upsert(created_event)
 
             return f"Event created successfully: {created_event.get('htmlLink')}"
         except HttpError as error:
             return f"Error creating the event: {error}"
 
-    def list_events(self, params: EventListParams) -> str:
+    async def list_events(self, params: EventListParams) -> str:
 
         try:
-            start_time = params.start_time + "Z"
-            end_time = params.end_time + "Z"
             max_results = params.max_results if params.max_results else 10
-
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=start_time,
-                timeMax=end_time,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy="startTime"
-            ).execute()
-
-            events = events_result.get("items", [])
+            events = await self._find_events(params.start_time, params.end_time, max_results)
 
             if not events:
                 return "No events found."
@@ -143,26 +218,164 @@ class EventManager:
         except HttpError as error:
             return f"Error retrieving events: {error}"
 
-    def delete_event(self, params: DeleteEventParams) -> str:
+    async def delete_event(self, params: DeleteEventParams) -> str:
 
         try:
-            start_time = params.start_time + "Z"
-            end_time = params.end_time + "Z"
+            service = await self._service()
+            events = await self._find_events(params.start_time, params.end_time)
 
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=start_time,
-                timeMax=end_time,
-                singleEvents=True,
-                orderBy="startTime"
-            ).execute()
+            event, message = self._resolve_event(params.search_name, events, params.event_id)
+            if not event:
+                return message
+
+            await transport.execute(service.events().delete(calendarId='primary', eventId=event['id'], sendUpdates='all'))
+            self.store.remove(event['id'])
+            return f"Event '{event['summary']}' deleted successfully."
+        except HttpError as error:
+            return f"Error deleting the event: {error}"
+
+    ### Bulk Methods ###
+    async def create_events(self, params: CreateEventsParams) -> str:
+        try:
+            service = await self._service()
+            # All inserts go out in one batch HTTP request
+            requests = [
+                (str(position), service.events().insert(calendarId='primary', body=self._event_body(event), sendUpdates='all'))
+                for position, event in enumerate(params.events)
+            ]
+            results = await asyncio.to_thread(execute_batch, service, requests)
+
+            report = []
+            for position, event in enumerate(params.events):
+                created_event, error = results.get(str(position), (None, "no response"))
+                if error:
+                    report.append(f"- {event.summary} ({event.start_time}): failed: {error}")
+                else:
+                    self.store.upsert(created_event)
+                    report.append(f"- {event.summary} ({event.start_time}): created")
+            return "\n".join(report) if report else "No events given."
+        except HttpError as error:
+            return f"Error creating the events: {error}"
+
+    async def delete_events(self, params: DeleteEventsParams) -> str:
+        try:
+            service = await self._service()
+            events = await self._find_events(params.start_time, params.end_time)
+            events_by_id = {event["id"]: event for event in events}
+
+            if params.event_ids:
+                targets = [events_by_id[event_id] for event_id in params.event_ids if event_id in events_by_id]
+            elif params.search_name:
+                if self.store.ready:
+                    ranked = self.store.search_titles(params.search_name, list(events_by_id), limit=len(events))
+                else:
+                    ranked = TitleIndex.from_items((event["id"], event.get("summary", "")) for event in events).search(params.search_name, limit=len(events))
+                targets = [events_by_id[key] for key, score in ranked if score >= BULK_MATCH_SCORE]
+                # Deletes are final: several title matches are only listed, the user confirms them first
+                if len(targets) > 1:
+                    candidate_list = [
+                        f"- {event['start'].get('dateTime', event['start'].get('date'))} | {event.get('summary', '')} (ID: {event['id']})"
+                        for event in targets
+                    ]
+                    return (f"{len(targets)} events match '{params.search_name}'. Ask the user to confirm, "
+                            "then repeat the call with the event_ids of the confirmed events:\n" + "\n".join(candidate_list))
+            else:
+                return "Give a search_name or event_ids."
+
+            if not targets:
+                return "No matching events found."
+
+            # All deletes go out in one batch HTTP request
+            requests = [
+                (event["id"], service.events().delete(calendarId='primary', eventId=event["id"], sendUpdates='all'))
+                for event in targets
+            ]
+            results = await asyncio.to_thread(execute_batch, service, requests)
+
+            report = []
+            for event in targets:
+                _, error = results.get(event["id"], (None, "no response"))
+                start = event['start'].get('dateTime', event['start'].get('date'))
+                if error:
+                    report.append(f"- {event.get('summary', '')} ({start}): failed: {error}")
+                else:
+                    self.store.remove(event["id"])
+                    report.append(f"- {event.get('summary', '')} ({start}): deleted")
+            return "\n".join(report)
+        except HttpError as error:
+            return f"Error deleting the events: {error}"
+
+    async def _busy_in_range(self, start: datetime, end: datetime) -> list:
+        # Events that block time in the range, from the mirror's interval index or from Google until it is ready
+        if self.store.ready:
+            return self.store.busy_between(start, end)
+
+        events = await asyncio.to_thread(self._list_events_from_api, start.isoformat(), end.isoformat())
+        return [event for event in events if event.get("transparency") != "transparent"]
+
+    async def events_on(self, day: date) -> list:
+        # All events of one local calendar day, ordered by start
+        start = datetime.combine(day, time.min, tzinfo=CALENDAR_TIMEZONE)
+        end = start + timedelta(days=1)
+        if self.store.ready:
+            return self.store.events_between(start, end)
+        return await asyncio.to_thread(self._list_events_from_api, start.isoformat(), end.isoformat())
+
+    @staticmethod
+    def _format_local(moment: datetime) -> str:
+        return moment.astimezone(CALENDAR_TIMEZONE).strftime("%Y-%m-%d %H:%M")
+
+    async def check_availability(self, params: AvailabilityParams) -> str:
+        try:
+            start = parse_local_time(params.start_time)
+            end = parse_local_time(params.end_time)
+            conflicts = await self._busy_in_range(start, end)
+
+            if not conflicts:
+                return "The time range is free."
+
+            conflict_list = [
+                f"- {self._format_local(parse_event_time(event['start']))} - {self._format_local(parse_event_time(event['end']))} | {event.get('summary', '')}"
+                for event in conflicts
+            ]
+            return "Conflicts found:\n" + "\n".join(conflict_list)
+        except ValueError as error:
+            return f"Invalid time format: {error}"
+        except HttpError as error:
+            return f"Error checking availability: {error}"
+
+    async def find_free_slot(self, params: FreeSlotParams) -> str:
+        try:
+            start = parse_local_time(params.search_start)
+            end = parse_local_time(params.search_end) if params.search_end else start + timedelta(days=7)
+            duration = params.duration_minutes * 60
+
+            busy = [
+                (parse_event_time(event["start"]).timestamp(), parse_event_time(event["end"]).timestamp())
+                for event in await self._busy_in_range(start, end)
+            ]
+
+            # Search day by day, only within the allowed hours
+            day = start.astimezone(CALENDAR_TIMEZONE).date()
+            while day <= end.astimezone(CALENDAR_TIMEZONE).date():
+                day_start = datetime.combine(day, time(min(params.earliest_hour, 23)), tzinfo=CALENDAR_TIMEZONE)
+                if params.latest_hour >= 24:
+                    day_end = datetime.combine(day + timedelta(days=1), time(0), tzinfo=CALENDAR_TIMEZONE)
+                else:
+                    day_end = datetime.combine(day, time(params.latest_hour), tzinfo=CALENDAR_TIMEZONE)
+                window_start = max(start, day_start).timestamp()
+                window_end = min(end, day_end).timestamp()
 
-            events = events_result.get("items", [])
+                if window_end > window_start:
+                    day_busy = [interval for interval in busy if interval[0] < window_end and interval[1] > window_start]
+                    slot = find_free_slot(day_busy, window_start, window_end, duration)
+                    if slot is not None:
+                        slot_start = datetime.fromtimestamp(slot, CALENDAR_TIMEZONE)
+                        return f"Next free slot: {self._format_local(slot_start)} - {self._format_local(slot_start + timedelta(seconds=duration))}"
+                day += timedelta(days=1)
 
-            for event in events:
-                if params.search_name.lower() in event.get("summary", "").lower():
-                    self.service.events().delete(calendarId='primary', eventId=event['id'], sendUpdates='all').execute()
-                    return f"Event '{event['summary']}' deleted successfully."
-            return "No matching event found."
+            return "No free slot found in the given range."
+        except ValueError as error:
+            return f"Invalid time format: {error}"
         except HttpError as error:
-            return f"Error deleting the event: {error}"
\ No newline at end of file
+            return f"Error searching for a free slot: {error}"
@@ -0,0 +1,179 @@
+import os
+import time
+from datetime import datetime, time as dt_time, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from googleapiclient.errors import HttpError
+from calendar_logic.interval_index import IntervalIndex
+from tools.title_index import TitleIndex
+from tools.pagination import Paginator, thread_http
+from tools.sync_store import SyncedStore, is_newer, now_rfc3339
+
+CALENDAR_TIMEZONE = ZoneInfo("Europe/Berlin")
+# Seconds between two incremental syncs in the background
+SYNC_INTERVAL = float(os.getenv("LYRA_CALENDAR_SYNC_INTERVAL", "60"))
+# events.list parameters of the full sync; incremental requests with its syncToken must repeat them
+# exactly, otherwise recurring series come back as masters instead of their expanded instances
+SYNC_PARAMS = {"singleEvents": True, "maxResults": 2500}
+
+
+def parse_query_time(value: str) -> datetime:
+    # Range bounds from the agent are naive ISO strings that the API treats as UTC ("...Z")
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_local_time(value: str) -> datetime:
+    # Times the agent means in the user's calendar, naive ones are local like in create_final_event
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=CALENDAR_TIMEZONE)
+
+
+def parse_event_time(event_time: dict) -> datetime:
+    # Google sends either a dateTime with offset or a date for all-day events
+    if "dateTime" in event_time:
+        return datetime.fromisoformat(event_time["dateTime"].replace("Z", "+00:00"))
+    day = datetime.fromisoformat(event_time["date"]).date()
+    return datetime.combine(day, dt_time.min, tzinfo=CALENDAR_TIMEZONE)
+
+
+class EventStore(SyncedStore):
+    """
+    Local mirror of one Google calendar.
+    A full sync fills it once, afterwards the background thread applies only the changes since the
+    last syncToken. EventManager writes are applied immediately, so reads see them at once.
+    Time-range reads go through an interval index, title lookups through a fuzzy title index.
+    """
+
+    thread_name = "calendar-sync"
+    sync_label = "Kalender"
+
+    def __init__(self, service_factory: Callable, calendar_id: str = "primary", sync_interval: float = SYNC_INTERVAL):
+        super().__init__(service_factory, sync_interval)
+        self.calendar_id = calendar_id
+        self.events: Dict[str, dict] = {}
+        self.index = IntervalIndex()
+        self.titles = TitleIndex()
+        self.sync_token: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        # Reads may only be served locally after the first full sync
+        return self.sync_token is not None
+
+    def sync(self, service):
+        # Incremental sync when a token exists, full sync otherwise or when Google expired the token
+        if self.sync_token:
+            try:
+                self._incremental_sync(service)
+                return
+            except HttpError as error:
+                if error.resp.status != 410:
+                    raise
+                print("ℹ️ Kalender-Sync-Token abgelaufen, vollständiger Sync.")
+        self._full_sync(service)
+
+    def _full_sync(self, service):
+        sync_started = now_rfc3339()
+        events = {}
+        pages = Paginator(lambda page_token: service.events().list(
+            calendarId=self.calendar_id,
+            pageToken=page_token,
+            **SYNC_PARAMS
+        ).execute(http=thread_http(service)))
+        for event in pages:
+            if event.get("status") != "cancelled":
+                events[event["id"]] = event
+        result = pages.last_page
+
+        with self.lock:
+            self._merge_local(events, self.events, sync_started)
+            self.events = events
+            self.index.clear()
+            self.titles.clear()
+            for event in events.values():
+                self._index(event)
+            self.sync_token = result.get("nextSyncToken")
+            self.synced_at = time.time()
+            self.version += 1
+            self._forget_tombstones_before(sync_started)
+
+    def _incremental_sync(self, service):
+        sync_started = now_rfc3339()
+        sync_token = self.sync_token
+        pages = Paginator(lambda page_token: service.events().list(
+            calendarId=self.calendar_id,
+            syncToken=sync_token,
+            pageToken=page_token,
+            **SYNC_PARAMS
+        ).execute(http=thread_http(service)))
+        for event in pages:
+            with self.lock:
+                self._apply(event)
+        result = pages.last_page
+
+        with self.lock:
+            self.sync_token = result.get("nextSyncToken", self.sync_token)
+            self.synced_at = time.time()
+            self._forget_tombstones_before(sync_started)
+
+    def _apply(self, event: dict):
+        # Apply one change from Google unless a local write is newer
+        event_id = event["id"]
+        current = self.events.get(event_id)
+        if current and not is_newer(event, current):
+            return
+        if event.get("status") == "cancelled":
+            if self.events.pop(event_id, None) is not None:
+                self.version += 1
+            self.index.remove(event_id)
+            self.titles.remove(event_id)
+            return
+        if self._deleted_locally(event):
+            return
+        self.events[event_id] = event
+        self._index(event)
+        self.version += 1
+
+    def _index(self, event: dict):
+        self.titles.add(event["id"], event.get("summary", ""))
+        try:
+            start = parse_event_time(event["start"]).timestamp()
+            end = parse_event_time(event["end"]).timestamp()
+        except (KeyError, ValueError):
+            # Without valid times the event cannot take part in range queries
+            self.index.remove(event["id"])
+            return
+        self.index.add(event["id"], start, end)
+
+    ### Local writes ###
+    def upsert(self, event: dict):
+        # Called with the API response of insert/update
+        with self.lock:
+            self.deleted.pop(event["id"], None)
+            self.events[event["id"]] = event
+            self._index(event)
+            self.version += 1
+
+    def remove(self, event_id: str):
+        with self.lock:
+            self.events.pop(event_id, None)
+            self.index.remove(event_id)
+            self.titles.remove(event_id)
+            self.deleted[event_id] = now_rfc3339()
+            self.version += 1
+
+    ### Local reads ###
+    def events_between(self, start: datetime, end: datetime) -> List[dict]:
+        # Events overlapping [start, end), ordered by start time like orderBy="startTime"
+        with self.lock:
+            return [self.events[event_id] for event_id in self.index.overlapping(start.timestamp(), end.timestamp())]
+
+    def busy_between(self, start: datetime, end: datetime) -> List[dict]:
+        # Like events_between, without events marked as "free" (transparent)
+        return [event for event in self.events_between(start, end) if event.get("transparency") != "transparent"]
+
+    def search_titles(self, query: str, event_ids: Optional[List[str]] = None, limit: int = 5) -> List[Tuple[str, float]]:
+        # Ranked (event ID, score) title matches, optionally limited to the given events
+        with self.lock:
+            return self.titles.search(query, event_ids, limit)
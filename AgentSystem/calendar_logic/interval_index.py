@@ -0,0 +1,89 @@
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class IntervalIndex:
+    """
+    Interval tree over [start, end) timestamps.
+    The tree is implicit in arrays sorted by start: the middle element of every range is the node,
+    and each node stores the largest end in its subtree. Range queries therefore skip every subtree
+    that ends before the range, which makes them O(log n + k). Changes only mark the tree dirty;
+    it is rebuilt in O(n log n) on the next query, as reads far outnumber calendar writes.
+    """
+
+    def __init__(self):
+        self.intervals: Dict[Hashable, Tuple[float, float]] = {}
+        self._dirty = True
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self._keys: List[Hashable] = []
+        self._max_end: List[float] = []
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self, key: Hashable, start: float, end: float):
+        self.intervals[key] = (start, max(start, end))
+        self._dirty = True
+
+    def remove(self, key: Hashable):
+        if self.intervals.pop(key, None) is not None:
+            self._dirty = True
+
+    def clear(self):
+        self.intervals.clear()
+        self._dirty = True
+
+    def overlapping(self, start: float, end: float) -> List[Hashable]:
+        # Keys of all intervals overlapping [start, end), ordered by interval start
+        self._build()
+        matches = []
+        self._query(0, len(self._starts), start, end, matches)
+        return [self._keys[position] for position in matches]
+
+    def _build(self):
+        if not self._dirty:
+            return
+        ordered = sorted(self.intervals.items(), key=lambda item: item[1])
+        self._keys = [key for key, _ in ordered]
+        self._starts = [interval[0] for _, interval in ordered]
+        self._ends = [interval[1] for _, interval in ordered]
+        self._max_end = list(self._ends)
+        self._augment(0, len(ordered))
+        self._dirty = False
+
+    def _augment(self, lo: int, hi: int) -> Optional[float]:
+        # Fill in the subtree maximum of every node, returns the maximum of [lo, hi)
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        for child in (self._augment(lo, mid), self._augment(mid + 1, hi)):
+            if child is not None and child > self._max_end[mid]:
+                self._max_end[mid] = child
+        return self._max_end[mid]
+
+    def _query(self, lo: int, hi: int, start: float, end: float, matches: List[int]):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return  # Everything below ends before the range
+        self._query(lo, mid, start, end, matches)
+        if self._starts[mid] < end:
+            if self._ends[mid] > start:
+                matches.append(mid)
+            self._query(mid + 1, hi, start, end, matches)
+
+
+def find_free_slot(busy: List[Tuple[float, float]], window_start: float, window_end: float, duration: float) -> Optional[float]:
+    """
+    Earliest start of a gap of at least `duration` seconds inside [window_start, window_end).
+    `busy` must be ordered by start, as returned by IntervalIndex.overlapping.
+    """
+    cursor = window_start
+    for busy_start, busy_end in busy:
+        if busy_start - cursor >= duration:
+            break
+        cursor = max(cursor, busy_end)
+        if cursor >= window_end:
+            return None
+    return cursor if window_end - cursor >= duration else None
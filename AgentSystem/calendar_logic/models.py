@@ -6,6 +6,7 @@ class DeleteEventParams(BaseModel):
     search_name: str = Field(..., description="Part of the title of the event to be deleted")
     start_time: str = Field(..., description="Start time of the search range in ISO format")
     end_time: str = Field(..., description="End time of the search range in ISO format")
+    event_id: Optional[str] = Field(None, description="Exact event ID, when an earlier call reported several matching events")
 
 
 # Model for reminders
@@ -18,6 +19,7 @@ class ModifyEventParams(BaseModel):
     search_name: str = Field(..., description="Part of the title of the event to be modified")
     start_time: str = Field(..., description="Start time of the search range in ISO format")
     end_time: str = Field(..., description="End time of the search range in ISO format")
+    event_id: Optional[str] = Field(None, description="Exact event ID, when an earlier call reported several matching events")
     new_summary: Optional[str] = Field(None, description="New title of the event")
     new_start_time: Optional[str] = Field(None, description="New start time in ISO format")
     new_end_time: Optional[str] = Field(None, description="New end time in ISO format")
@@ -49,3 +51,27 @@ class EventListParams(BaseModel):
     color_id: Optional[int] = Field(None, description="Color ID to filter events")
     title: Optional[str] = Field(None, description="Keyword in the title to filter events")
 
+
+# Model for checking whether a time range is free
+class AvailabilityParams(BaseModel):
+    start_time: str = Field(..., description="Start of the time range in ISO format, local time (e.g., '2025-04-10T15:00:00')")
+    end_time: str = Field(..., description="End of the time range in ISO format, local time (e.g., '2025-04-10T16:00:00')")
+
+# Model for finding the next free slot
+class FreeSlotParams(BaseModel):
+    duration_minutes: int = Field(..., description="Required length of the slot in minutes")
+    search_start: str = Field(..., description="Earliest start of the slot in ISO format, local time")
+    search_end: Optional[str] = Field(None, description="Latest end of the slot in ISO format, local time (default: 7 days after search_start)")
+    earliest_hour: int = Field(8, description="Slots start no earlier than this hour of the day")
+    latest_hour: int = Field(20, description="Slots end no later than this hour of the day")
+
+# Model for creating several events at once
+class CreateEventsParams(BaseModel):
+    events: List[EventDetails] = Field(..., description="Events to create")
+
+# Model for deleting several events at once
+class DeleteEventsParams(BaseModel):
+    search_name: Optional[str] = Field(None, description="Title (or part of it) of the events to delete; several matching events are only listed for confirmation")
+    start_time: str = Field(..., description="Start time of the search range in ISO format")
+    end_time: str = Field(..., description="End time of the search range in ISO format")
+    event_ids: Optional[List[str]] = Field(None, description="Exact event IDs to delete instead of a title search")
@@ -1,23 +1,36 @@
 import asyncio
 import time
-from datetime import timedelta
-from agent.agent_termin import appointment_agent
-from agent.agent_todo import todo_agent
-from tools.context_manager import ContextManager
+from datetime import datetime
+from agent.agent_termin import appointment_agent, event_manager
+from agent.agent_todo import todo_agent, task_manager
+from agent.fast_path import FastPathEngine
+from calendar_logic.event_store import CALENDAR_TIMEZONE
+from tools.authentication import Authenticator
+from tools.session import Session, SessionManager
+from tools.session_store import SessionStore, SESSION_STORE_ENABLED
+from tools.intent_router import IntentRouter
+from tools.response_cache import ResponseCache, RESPONSE_CACHE_ENABLED
 from tools.stt_tts import Converter
+from tools.startup import StartupReport
+from tools.metrics import observe_trace
+from tools.tracing import Trace, activate, current_trace, span, tracer
+from tools.tts_pipeline import SentenceSplitter, synthesize_in_order
 from agents import Agent, Runner, WebSearchTool
+from openai.types.responses import ResponseTextDeltaEvent
 import re
-from typing import Union
-import os
+from typing import AsyncIterator, Optional, Union
 
 
 class HandoffAgentSystem:
     def __init__(self, debug_time: bool = False):
-        # Initialize context manager and text-to-speech converter
-        self.context_manager = ContextManager()
+        # Shared text-to-speech converter; context and timings live in per-connection sessions
         self.converter = Converter()
-        self.timestamps = {}
+        self.sessions = SessionManager(SessionStore() if SESSION_STORE_ENABLED else None)
+        # Session of local calls without a client (CLI); not registered, so it is not counted as a connection
+        self.default_session = Session("default")
         self.debug_time = debug_time
+        # Spans of the Agents SDK (LLM turns, handoffs, function tools) go into the request traces
+        tracer.install_agent_processor()
 
         # Define the coordinator agent with specific instructions and tools
         self.coordinator_agent = Agent(
@@ -29,84 +42,207 @@ class HandoffAgentSystem:
             tools=[WebSearchTool()]
         )
 
-    async def run(self, audio_input: Union[str, bytes]):
-        # Record the start timestamp
-        self.timestamps["start"] = time.time()
-        audio_input, temp_path = self.prepare_audio_input(audio_input)
-        try:
-            # Convert speech to text
-            user_input = self.speech_to_text(audio_input)
+        # Clear calendar and todo requests go straight to the specialist, saving the handoff turn
+        self.router = IntentRouter()
+        self.specialists = {"appointment": appointment_agent, "todo": todo_agent}
+        # Time, date, today's events, reading a list: answered locally without any LLM turn
+        self.fast_path = FastPathEngine(event_manager, task_manager)
+        # Answers of read-only turns, valid while the calendar/task data behind them is unchanged
+        self.response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+
+    async def warm_up(self, report: StartupReport):
+        # Everything that is otherwise created lazily by the first request, in the background
+        steps = [
+            ("google oauth", Authenticator.credential_store.get),
+            ("tts client", lambda: self.converter.tts_client),
+            ("stt client", lambda: self.converter.stt_client),
+            ("calendar mirror", event_manager.start),
+            ("tasks mirror", task_manager.start),
+        ]
+        for step, action in steps:
+            with report.measure("warmup", step):
+                try:
+                    await asyncio.to_thread(action)
+                except Exception as e:
+                    print(f"⚠️ Warm-up '{step}' fehlgeschlagen:", str(e))
+        # The event loop's own Calendar and Tasks services, built off the loop, so the first tool call finds them
+        for step, auth_type in (("calendar service", "event"), ("tasks service", "todo")):
+            with report.measure("warmup", step):
+                try:
+                    await Authenticator.async_authenticate(auth_type)
+                except Exception as e:
+                    print(f"⚠️ Warm-up '{step}' fehlgeschlagen:", str(e))
 
-            # Exit condition for the agent
-            if user_input.lower() in ["exit", "quit"]:
-                print("Handoff Agent terminated. Goodbye!")
-                return
+    async def run(self, audio_input: Union[str, bytes], session: Optional[Session] = None):
+        # Answer one utterance and return the whole reply as one audio blob
+        return await self._collect(self.stream(audio_input, session))
 
-            # Process the user input and generate a response
-            response = await self.run_assistant(user_input)
-            print(f"Result: {response}")
+    async def stream(self, audio_input: Union[str, bytes], session: Optional[Session] = None) -> AsyncIterator[bytes]:
+        # Answer one utterance and yield the reply audio sentence by sentence
+        session = session or self.default_session
+        async with session.lock:
+            session.touch()
+            session.trace = tracer.start(session.session_id)
+            try:
+                with activate(session.trace):
+                    # Convert speech to text
+                    user_input = await self.speech_to_text(audio_input, session)
+                    async for audio_segment in self._respond(user_input, session):
+                        yield audio_segment
+            finally:
+                self._finish_trace(session)
 
-            # Clean the response for text-to-speech conversion
-            cleaned_response = self.clean_for_tts(response)
-            audio_response = self.text_to_speech(cleaned_response)
+    async def transcribe(self, audio_input: Union[str, bytes]) -> str:
+        # Only the speech-to-text step, for callers that report the transcript before answering it
+        return await self.converter.async_speech_to_text(audio_input) or ""
 
-            # Update the context with the new user input and response
-            self.update_context(user_input, response)
-            self.timestamps["end"] = time.time()
+    async def stream_transcript(self, user_input: str, session: Optional[Session] = None, trace: Optional[Trace] = None) -> AsyncIterator[bytes]:
+        """
+        Answer an utterance that was already transcribed, e.g. by a streaming recognition.
+        trace is the request trace the caller started before the recognition, with its STT span;
+        without one, a new trace starts here.
+        """
+        session = session or self.default_session
+        async with session.lock:
+            session.touch()
+            session.trace = trace or tracer.start(session.session_id)
+            try:
+                with activate(session.trace):
+                    async for audio_segment in self._respond(user_input, session):
+                        yield audio_segment
+            finally:
+                self._finish_trace(session)
 
-            # Print debug information if enabled
-            if self.debug_time:
-                self.print_debug_times()
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-            return audio_response
+    def _finish_trace(self, session: Session):
+        tracer.finish(session.trace)
+        observe_trace(session.trace)
+        # Print debug information if enabled
+        if self.debug_time:
+            tracer.print_trace(session.trace)
 
+    async def _collect(self, audio_segments: AsyncIterator[bytes]):
+        # Join the segments of one reply; MP3 frames can simply be concatenated
+        try:
+            segments = [segment async for segment in audio_segments]
+            return b"".join(segments) if segments else None
         except Exception as e:
             print(f"Error during agent execution: {e}")
             return None
 
-    def speech_to_text(self, audio_input):
-        # Convert speech input to text
-        self.timestamps["stt_start"] = time.time()
-        user_input = str(self.converter.speech_to_text(audio_input)) #AUDIO
-        self.timestamps["stt_end"] = time.time()
+    async def _respond(self, user_input: str, session: Session) -> AsyncIterator[bytes]:
+        # Exit condition for the agent
+        if user_input.lower() in ["exit", "quit"]:
+            print("Handoff Agent terminated. Goodbye!")
+            return
+
+        # Answers that need no LLM: local templates first, then an earlier answer to the same read-only question.
+        # Cached answers are only used for questions without recent turns, which could change their meaning.
+        prepared = None  # (reply text, intent)
+        standalone = not session.context_manager.has_recent_turns
+        cache_day, data_versions = self._data_versions()
+        fast_answer = await self.fast_path.answer(user_input)
+        if fast_answer:
+            prepared = (fast_answer.text, fast_answer.intent)
+        elif self.response_cache and standalone:
+            cached = self.response_cache.get(user_input, cache_day, data_versions)
+            if cached:
+                print("💾 Antwort aus dem Cache")
+                prepared = (cached.text, cached.intent)
+        if prepared and prepared[1] in self.specialists:
+            session.last_intent = prepared[1]
+
+        # Cut the streamed reply into sentences and synthesize each one while the agent keeps generating
+        reply_parts = []
+        tool_calls = []
+
+        async def sentences():
+            splitter = SentenceSplitter()
+            deltas = self._single(prepared[0]) if prepared else self.run_assistant_streamed(user_input, session, tool_calls)
+            async for delta in deltas:
+                reply_parts.append(delta)
+                for sentence in splitter.feed(delta):
+                    cleaned_sentence = self.clean_for_tts(sentence)
+                    if cleaned_sentence:
+                        yield cleaned_sentence
+            rest = splitter.flush()
+            cleaned_rest = self.clean_for_tts(rest) if rest else ""
+            if cleaned_rest:
+                yield cleaned_rest
+
+        async for audio_segment in synthesize_in_order(sentences(), lambda sentence: self.text_to_speech(sentence, session)):
+            session.trace.mark("first_audio")
+            yield audio_segment
+
+        response = "".join(reply_parts)
+
+        # Only turns that called nothing but read-only tools are cached, with the versions they read
+        if not prepared and self.response_cache and standalone and response:
+            sources = ResponseCache.cacheable_sources(tool_calls)
+            if sources is not None:
+                self.response_cache.put(user_input, response, session.last_intent, cache_day,
+                                        {source: data_versions[source] for source in sources})
+        print(f"Result: {response}")
+
+        # Update the context with the new user input and response
+        self.update_context(user_input, response, session)
+        self.sessions.save(session)
+
+    @staticmethod
+    async def _single(text: str) -> AsyncIterator[str]:
+        # A finished reply in the shape of a streamed one
+        yield text
+
+    async def speech_to_text(self, audio_input, session: Session):
+        # Convert speech input to text without blocking the other sessions
+        with span("recognize", "stt"):
+            user_input = str(await self.converter.async_speech_to_text(audio_input)) #AUDIO
         return user_input
     
-    def text_to_speech(self, cleaned_response):
-        # Convert text response to speech
-        self.timestamps["tts_start"] = time.time()
-        audio_response = self.converter.text_to_speech(cleaned_response)
-        self.timestamps["tts_end"] = time.time()
+    async def text_to_speech(self, cleaned_response, session: Session):
+        # Convert text response to speech without blocking the other sessions.
+        # Sentences are synthesized in parallel, one span each.
+        with span("synthesize", "tts", chars=len(cleaned_response)):
+            audio_response = await self.converter.async_text_to_speech(cleaned_response)
         return audio_response
 
-    async def run_assistant(self, user_input):
-        # Run the assistant agent with the given user input
-        context_summary = self.context_manager.get_context_summary()
-        full_input = f"History: {context_summary}\n\nNew Input: {user_input}"
+    def _data_versions(self):
+        # The local day and the version of every data source a cached answer may depend on
+        versions = {"calendar": event_manager.store.version, "tasks": task_manager.store.version}
+        return datetime.now(CALENDAR_TIMEZONE).date(), versions
 
-        self.timestamps["agent_start"] = time.time()
-        result = await Runner.run(self.coordinator_agent, full_input)
-        self.timestamps["agent_end"] = time.time()
-        return result.final_output
+    async def run_assistant_streamed(self, user_input, session: Session, tool_calls: Optional[list] = None) -> AsyncIterator[str]:
+        # Run the assistant agent with the given user input and yield the reply text as it is generated.
+        # Names of the tools it called are appended to tool_calls.
+        context_summary = session.context_manager.get_context_summary()
+        full_input = f"History: {context_summary}\n\nNew Input: {user_input}"
 
-    def update_context(self, user_input, assistant_response):
-        # Update the context manager with new user input and assistant response
-        self.context_manager.update_context("User", user_input)
-        self.context_manager.update_context("Assistant", assistant_response)
+        trace = current_trace()
+        agent_start = time.time()
+        decision = self.router.route(user_input, session.last_intent)
+        starting_agent = self.specialists[decision.intent] if decision.direct else self.coordinator_agent
 
-    def print_debug_times(self):
-        # Print the timing information for debugging
-        print("\n⏱️ Timing Overview:")
-        def duration(label, start, end):
-            return f"{label:<20} → {timedelta(seconds=self.timestamps[end] - self.timestamps[start])}"
+        # Recorded by hand: a span context must not stay open across the yields below
+        result = Runner.run_streamed(starting_agent, full_input)
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                if trace:
+                    trace.mark("agent_first_token")
+                yield event.data.delta
+        if trace:
+            trace.add(starting_agent.name, "agent_run", agent_start, time.time(), route=decision.intent, direct=decision.direct)
 
-        print(duration("Speech-to-Text", "stt_start", "stt_end"))
-        print(duration("Agent Run", "agent_start", "agent_end"))
-        print(duration("Text-to-Speech", "tts_start", "tts_end"))
+        # Remember who actually answered, also when the coordinator handed off
+        session.last_intent = next((intent for intent, agent in self.specialists.items() if agent is result.last_agent), None)
+        if tool_calls is not None:
+            for item in result.new_items:
+                if item.type == "tool_call_item":
+                    # Function tools have a name, hosted tools like web search only a type
+                    tool_calls.append(getattr(item.raw_item, "name", None) or getattr(item.raw_item, "type", "tool"))
 
-        total_time = self.timestamps["end"] - self.timestamps["start"]
-        print(f"\n🕒 Total Duration: {timedelta(seconds=total_time)}")
-    
+    def update_context(self, user_input, assistant_response, session: Session):
+        # Update the session's context manager with new user input and assistant response
+        session.context_manager.update_context("User", user_input)
+        session.context_manager.update_context("Assistant", assistant_response)
 
     def clean_for_tts(self, text):
         # Replace any complete sentence containing an https link with "Task completed!"
@@ -115,24 +251,11 @@ class HandoffAgentSystem:
         # Remove Markdown, bullet points, parentheses, etc.
         text = re.sub(r"\*\*|__|\*", "", text)                    # Markdown bold
         text = re.sub(r"\n\s*[-•]\s*", " ", text)                 # List items
+        text = re.sub(r"^\s*[-•]\s*", "", text)                   # List item at the start of a sentence
         text = re.sub(r"\([^)]*\)", "", text)                     # Content in parentheses
         text = re.sub(r"\s+", " ", text)                          # Multiple spaces
         return text.strip()
 
-    def prepare_audio_input(self, audio_input: Union[str, bytes]) -> tuple[str, Union[str, None]]:
-        """
-        Convert bytes to a temporary file and return the path.
-        Also returns the temporary path for potential deletion.
-        """
-        if isinstance(audio_input, bytes):
-            temp_path = "temp_input.wav"
-            with open(temp_path, "wb") as f:
-                f.write(audio_input)
-            return temp_path, temp_path
-        else:
-            return audio_input, None
-
-
 
 # Start the asynchronous loop
 if __name__ == "__main__":
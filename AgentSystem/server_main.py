@@ -1,37 +1,270 @@
+from tools.startup import startup_report, WARMUP_ENABLED
+
+# Heavy dependencies first, so each entry of the report only counts what the module adds
+startup_report.import_modules([
+    "fastapi",
+    "google.cloud.texttospeech",
+    "google.cloud.speech",
+    "googleapiclient.discovery",
+    "httpx",
+    "agents",
+    "calendar_logic.event_manager",
+    "todo_logic.todo_manager",
+    "agent.agent_termin",
+    "agent.agent_todo",
+    "main",
+])
+
 from fastapi import FastAPI, WebSocket
-from main import HandoffAgentSystem  
-import base64
+from fastapi.responses import PlainTextResponse
+from main import HandoffAgentSystem
+from tools.protocol import LegacyChannel, ProtocolChannel, parse_control_message, parse_sample_rate
+from tools.async_transport import transport
+from tools.metrics import registry, monitor_event_loop_lag
+from tools.tracing import Trace, activate, span, tracer
 import asyncio
+import time
 
 app = FastAPI()
-agent = HandoffAgentSystem(debug_time=False)
+# Shared clients and agents; every connection gets its own session below
+with startup_report.measure("init", "HandoffAgentSystem"):
+    agent = HandoffAgentSystem(debug_time=False)
+warmup_task = None
+loop_lag_task = None
+
+# Read at scrape time
+registry.gauge("lyra_active_sessions", "Open WebSocket sessions.", lambda: agent.sessions.active_count)
+
+def cache_lookups():
+    lookups = {}
+    tts_cache = agent.converter.tts_cache
+    if tts_cache:
+        lookups[("tts", "hit")] = tts_cache.stats["memory_hits"] + tts_cache.stats["disk_hits"]
+        lookups[("tts", "miss")] = tts_cache.stats["misses"]
+    if agent.response_cache:
+        lookups[("response", "hit")] = agent.response_cache.stats["hits"]
+        lookups[("response", "miss")] = agent.response_cache.stats["misses"]
+    return lookups
+
+def cache_hit_ratios():
+    ratios = {}
+    if agent.converter.tts_cache:
+        ratios[("tts",)] = agent.converter.tts_cache.hit_ratio()
+    if agent.response_cache:
+        ratios[("response",)] = agent.response_cache.hit_ratio()
+    return ratios
+
+registry.callback("lyra_cache_lookups_total", "Lookups of the TTS and response caches.", "counter", cache_lookups, ("cache", "result"))
+registry.callback("lyra_cache_hit_ratio", "Hit ratio of the TTS and response caches since start.", "gauge", cache_hit_ratios, ("cache",))
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    global loop_lag_task
+    loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+
+@app.on_event("startup")
+async def start_warm_up():
+    global warmup_task
+    startup_report.print()
+    if WARMUP_ENABLED:
+        # Runs once the server accepts connections; requests arriving earlier initialize lazily
+        warmup_task = asyncio.create_task(warm_up())
+
+async def warm_up():
+    await agent.warm_up(startup_report)
+    startup_report.print("warmup")
+
+@app.on_event("shutdown")
+async def close_google_connections():
+    # Pooled Calendar/Tasks connections are shared by all sessions
+    await transport.close()
+
+@app.on_event("shutdown")
+async def flush_sessions():
+    # Session state that is still queued must reach the database before the process exits
+    for session_id in list(agent.sessions.sessions):
+        agent.sessions.close(session_id)
+    if agent.sessions.store:
+        await agent.sessions.store.close()
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/latency")
+async def latency():
+    # p50/p95/p99 per span over the last requests, in ms
+    return tracer.percentiles()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    # Accept the WebSocket connection
+    """
+    One complete utterance per binary frame. Clients speaking protocol v1 (see tools/protocol.py)
+    get binary audio segments and JSON control frames, all others the legacy Base64 reply.
+    """
+    # Accept the WebSocket connection and open a session for it
     await websocket.accept()
-    print("🔌 Client connected")
+    session = agent.sessions.open()
+    # Legacy clients cannot send a hello, they pass the token of their previous connection in the URL
+    await agent.sessions.resume(session, websocket.query_params.get("session_token"))
+    channel = None
+    turn = 0
+    print(f"🔌 Client connected (session {session.session_id}, active: {agent.sessions.active_count})")
 
     try:
         while True:
-            # Receive audio data from the client
-            data = await websocket.receive_bytes()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("text") is not None:
+                control = parse_control_message(message["text"])
+                if control and control["type"] == "hello" and channel is None:
+                    channel = ProtocolChannel(websocket)
+                    resumed = await agent.sessions.resume(session, control.get("session_token"))
+                    await channel.send_hello(session.session_id, session.token, resumed)
+                elif channel:
+                    await channel.send_error(turn, "bad_request", "Expected a binary audio frame.")
+                continue
 
+            # Receive audio data from the client
+            data = message.get("bytes")
+            if data is None:
+                continue
+            channel = channel or LegacyChannel(websocket, joined=True)
+            turn += 1
             print("🎙️ Audio received. Length:", len(data), "Bytes")
+            await answer_audio(channel, session, turn, data)
+
+    except Exception as e:
+        # Handle WebSocket errors
+        print("❌ WebSocket error:", e)
+        await websocket.close()
+    finally:
+        agent.sessions.close(session.session_id)
+        print(f"🔌 Client disconnected (session {session.session_id}, active: {agent.sessions.active_count})")
+
 
-            audio_bytes = data
-            audio_response = await agent.run(audio_bytes)
+@app.websocket("/ws/stream")
+async def streaming_endpoint(websocket: WebSocket):
+    """
+    Streaming variant of /ws: the client sends "start", then raw LINEAR16 chunks while recording,
+    and optionally "end". Recognition runs while the user talks and the server detects the end
+    of the utterance itself, so the agent starts as soon as the user stops speaking.
+    The reply is streamed back sentence by sentence while the agent is still generating.
+    The sample rate can be passed as query parameter, e.g. /ws/stream?sample_rate=16000,
+    or per utterance in the protocol v1 start message.
+    """
+    await websocket.accept()
+    session = agent.sessions.open()
+    await agent.sessions.resume(session, websocket.query_params.get("session_token"))
+    channel = LegacyChannel(websocket, joined=False)
+    # Validated when an utterance starts, so a bad value is reported in the client's protocol
+    default_sample_rate = websocket.query_params.get("sample_rate", 16000)
+    turn = 0
+    print(f"🔌 Streaming client connected (session {session.session_id}, active: {agent.sessions.active_count})")
+
+    stream = None
+    # Replies still running; the event loop only keeps weak references to tasks
+    replies = set()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
 
-            if audio_response:
-                # Encode the audio response to Base64 and send it back
-                audio_base64 = base64.b64encode(audio_response).decode("utf-8")
-                await websocket.send_text(audio_base64)
-                print("🔊 Audio response sent.")
-            else:
-                # Send an error message if processing fails
-                await websocket.send_text("[Error during processing]")
+            if message.get("text") is not None:
+                # Protocol v1 JSON commands, or the legacy plain "start" / "end"
+                control = parse_control_message(message["text"]) or {"type": message["text"].strip().lower()}
+                if control["type"] == "hello" and turn == 0:
+                    channel = ProtocolChannel(websocket)
+                    resumed = await agent.sessions.resume(session, control.get("session_token"))
+                    await channel.send_hello(session.session_id, session.token, resumed)
+                elif control["type"] == "start":
+                    sample_rate = parse_sample_rate(control.get("sample_rate", default_sample_rate))
+                    if sample_rate is None:
+                        await channel.send_error(turn, "bad_request", f"Invalid sample_rate: {control.get('sample_rate', default_sample_rate)}")
+                        continue
+                    # New utterance: close the audio of a previous one that is still open
+                    if stream:
+                        stream.finish()
+                    turn += 1
+                    stream = agent.converter.start_speech_stream(sample_rate)
+                    reply = asyncio.create_task(answer_stream(channel, session, turn, stream))
+                    replies.add(reply)
+                    reply.add_done_callback(replies.discard)
+                elif control["type"] == "end" and stream:
+                    stream.finish()
+                else:
+                    await channel.send_error(turn, "bad_request", f"Unknown command: {control['type']}")
+            elif message.get("bytes") is not None and stream:
+                # Chunks after the detected end of utterance are dropped by the stream
+                stream.feed(message["bytes"])
 
     except Exception as e:
-        # Handle WebSocket errors
         print("❌ WebSocket error:", e)
         await websocket.close()
+    finally:
+        if stream:
+            stream.finish()
+        # Nobody is left to hear the replies; stop them before the session is saved and closed
+        for reply in replies:
+            reply.cancel()
+        await asyncio.gather(*replies, return_exceptions=True)
+        agent.sessions.close(session.session_id)
+        print(f"🔌 Streaming client disconnected (session {session.session_id}, active: {agent.sessions.active_count})")
+
+
+async def answer_audio(channel, session, turn: int, audio_bytes: bytes):
+    # Batch recognition of a complete utterance, then answer it
+    await channel.send_status(turn, "processing")
+    trace = tracer.start(session.session_id)
+    with activate(trace):
+        with span("recognize", "stt"):
+            transcript = await agent.transcribe(audio_bytes)
+    await answer_transcript(channel, session, turn, transcript, trace)
+
+
+async def answer_stream(channel, session, turn: int, stream):
+    # Wait for the final transcript of a streaming recognition, then answer it
+    try:
+        transcript = await stream.transcript()
+        # The recognition ran while the user was talking, the trace starts with it
+        trace = tracer.start(session.session_id)
+        trace.start = stream.started_at
+        trace.add("streaming_recognition", "stt", stream.started_at, time.time())
+        await channel.send_status(turn, "processing")
+        await answer_transcript(channel, session, turn, transcript, trace)
+    except Exception as e:
+        # The client may have disconnected while the turn was running
+        print("❌ Streaming response error:", e)
+
+
+async def answer_transcript(channel, session, turn: int, transcript: str, trace: Trace):
+    # Stream the reply segment by segment, then close the turn with the end marker and timings
+    if not transcript:
+        await channel.send_error(turn, "no_speech", "No speech detected.")
+        return
+
+    print("🎙️ Utterance recognized:", transcript)
+    await channel.send_transcript(turn, transcript)
+    segments = 0
+    try:
+        async for audio_segment in agent.stream_transcript(transcript, session, trace):
+            await channel.send_audio(turn, segments, audio_segment)
+            segments += 1
+    except Exception as e:
+        print(f"Error during agent execution: {e}")
+        await channel.send_error(turn, "processing_failed", str(e))
+        return
+
+    if not segments:
+        await channel.send_error(turn, "processing_failed", "The reply could not be synthesized.")
+        return
+
+    await channel.send_audio_end(turn, segments)
+    # The turn's own trace: session.trace may already belong to the next turn
+    await channel.send_timing(turn, trace.timestamps())
+    await channel.send_status(turn, "done")
+    print(f"🔊 Audio response sent ({segments} segments).")
@@ -27,3 +27,42 @@ class TaskListParams(BaseModel):
 class DeleteTodoParams(BaseModel):
     tasklist_id: str = Field(..., description="ID der Aufgabenliste")
     task_id: str = Field(..., description="ID der Aufgabe")
+
+# 🔍 Modell zur Suche einer Aufgabe nach Titel
+class SearchTodoParams(BaseModel):
+    tasklist_id: str = Field(..., description="ID der Aufgabenliste")
+    query: str = Field(..., description="Titel oder Teil des Titels der gesuchten Aufgabe")
+
+# 📦 Modell zum Anlegen mehrerer Aufgaben auf einmal
+class CreateTodosParams(BaseModel):
+    todos: List[TodoDetails] = Field(..., description="Anzulegende Aufgaben")
+
+# 🏷️ Modell für eine Aufgabe, die über ihren Namen statt über IDs angesprochen wird
+class TodoByNameParams(BaseModel):
+    task_name: str = Field(..., description="Titel oder Teil des Titels der Aufgabe")
+    list_name: Optional[str] = Field(None, description="Name der Aufgabenliste, ohne Angabe die Standardliste")
+
+# ➕ Modell zum Anlegen einer Aufgabe in einer Liste, die über ihren Namen angegeben wird
+class CreateTodoInListParams(BaseModel):
+    title: str = Field(..., description="Titel der Aufgabe")
+    list_name: Optional[str] = Field(None, description="Name der Aufgabenliste, ohne Angabe die Standardliste")
+    notes: Optional[str] = Field(None, description="Zusätzliche Notizen zur Aufgabe")
+    due: Optional[str] = Field(None, description="Fälligkeitsdatum im ISO-Format (z.B. '2025-04-10T17:00:00.000Z')")
+
+# ✏️ Modell zum Ändern einer Aufgabe über ihren Namen
+class ModifyTodoByNameParams(BaseModel):
+    task_name: str = Field(..., description="Titel oder Teil des Titels der Aufgabe")
+    list_name: Optional[str] = Field(None, description="Name der Aufgabenliste, ohne Angabe die Standardliste")
+    new_title: Optional[str] = Field(None, description="Neuer Titel der Aufgabe")
+    new_notes: Optional[str] = Field(None, description="Neue Notizen zur Aufgabe")
+    new_due: Optional[str] = Field(None, description="Neues Fälligkeitsdatum im ISO-Format")
+    new_status: Optional[str] = Field(None, description="Neuer Status der Aufgabe ('needsAction' oder 'completed')")
+
+# 📋 Modell zum Auflisten einer Liste über ihren Namen
+class ListTodosByNameParams(BaseModel):
+    list_name: Optional[str] = Field(None, description="Name der Aufgabenliste, ohne Angabe die Standardliste")
+    max_results: Optional[int] = Field(None, description="Maximale Anzahl anzuzeigender Aufgaben")
+
+# 📅 Modell für fällige Aufgaben über alle Listen
+class DueTodosParams(BaseModel):
+    date: Optional[str] = Field(None, description="Stichtag im Format YYYY-MM-DD, ohne Angabe heute; überfällige Aufgaben werden mit aufgeführt")
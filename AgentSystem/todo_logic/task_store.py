@@ -0,0 +1,208 @@
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from tools.title_index import TitleIndex
+from tools.pagination import Paginator, thread_http
+from tools.sync_store import SyncedStore, is_newer, now_rfc3339, to_rfc3339
+
+# Largest page the Tasks API returns
+PAGE_SIZE = 100
+# Seconds between two incremental syncs in the background
+SYNC_INTERVAL = float(os.getenv("LYRA_TASK_SYNC_INTERVAL", "60"))
+# updatedMin reaches this far before the previous sync, so clock skew cannot drop a change
+SYNC_OVERLAP = timedelta(minutes=2)
+
+
+class TaskStore(SyncedStore):
+    """
+    Local copy of all task lists and their tasks.
+    Every list is loaded in full once, afterwards the background thread only fetches the tasks
+    changed since the last sync (updatedMin with showDeleted/showHidden, so deletions and cleared
+    tasks arrive as well). TaskManager writes are applied immediately, so reads see them at once.
+    Lists and tasks are indexed by title for name lookups.
+    """
+
+    thread_name = "tasks-sync"
+    sync_label = "Aufgaben"
+
+    def __init__(self, service_factory: Callable, sync_interval: float = SYNC_INTERVAL):
+        super().__init__(service_factory, sync_interval)
+        self.tasklists: Dict[str, dict] = {}
+        self.list_titles = TitleIndex()
+        self.tasks: Dict[str, Dict[str, dict]] = {}  # tasklist ID → task ID → task
+        self.task_titles: Dict[str, TitleIndex] = {}
+        self.synced_since: Dict[str, str] = {}  # tasklist ID → start of its last sync
+
+    @property
+    def ready(self) -> bool:
+        # The task lists themselves are known; single lists may still be loaded on demand
+        return self.synced_at is not None
+
+    ### Sync ###
+    def sync(self, service):
+        # The tasklists endpoint has no updatedMin, but it is a single small page
+        self.load_tasklists(service)
+        for tasklist_id in list(self.tasklists):
+            if tasklist_id in self.synced_since:
+                self._incremental_sync(service, tasklist_id)
+            else:
+                self.load_tasks(service, tasklist_id)
+
+    def load_tasklists(self, service):
+        tasklists = list(Paginator(lambda page_token: service.tasklists().list(
+            maxResults=PAGE_SIZE,
+            pageToken=page_token
+        ).execute(http=thread_http(service))))
+
+        with self.lock:
+            known = {tasklist["id"] for tasklist in tasklists}
+            for tasklist_id in list(self.tasklists):
+                if tasklist_id not in known:
+                    self.remove_tasklist(tasklist_id)
+            # Rebuilt in Google's order, the default list comes first
+            if list(self.tasklists.values()) != tasklists:
+                self.version += 1
+            self.tasklists = {tasklist["id"]: tasklist for tasklist in tasklists}
+            for tasklist in tasklists:
+                self.list_titles.add(tasklist["id"], tasklist.get("title", ""))
+            self.synced_at = time.time()
+
+    def load_tasks(self, service, tasklist_id: str):
+        # Full load of one list, used on its first sync
+        sync_started = now_rfc3339()
+        tasks = {}
+        for task in self._list_tasks(service, tasklist_id):
+            if not task.get("deleted") and not task.get("hidden"):
+                tasks[task["id"]] = task
+
+        with self.lock:
+            self._merge_local(tasks, self.tasks.get(tasklist_id, {}), sync_started)
+            self.tasks[tasklist_id] = tasks
+            self.task_titles[tasklist_id] = TitleIndex.from_items((task_id, task.get("title", "")) for task_id, task in tasks.items())
+            self.synced_since[tasklist_id] = sync_started
+            self.version += 1
+            self._forget_tombstones()
+
+    def _incremental_sync(self, service, tasklist_id: str):
+        sync_started = now_rfc3339()
+        since = datetime.fromisoformat(self.synced_since[tasklist_id].replace("Z", "+00:00")) - SYNC_OVERLAP
+        for task in self._list_tasks(service, tasklist_id, updated_min=to_rfc3339(since)):
+            with self.lock:
+                self._apply(tasklist_id, task)
+        with self.lock:
+            if tasklist_id in self.synced_since:
+                self.synced_since[tasklist_id] = sync_started
+            self._forget_tombstones()
+
+    @staticmethod
+    def _list_tasks(service, tasklist_id: str, updated_min: Optional[str] = None) -> Paginator:
+        params = {"tasklist": tasklist_id, "maxResults": PAGE_SIZE}
+        if updated_min:
+            params.update(updatedMin=updated_min, showDeleted=True, showHidden=True)
+        return Paginator(lambda page_token: service.tasks().list(
+            pageToken=page_token,
+            **params
+        ).execute(http=thread_http(service)))
+
+    def _apply(self, tasklist_id: str, task: dict):
+        # Apply one change from Google unless a local write is newer
+        tasks = self.tasks.get(tasklist_id)
+        if tasks is None:
+            return  # List was deleted meanwhile
+        task_id = task["id"]
+        current = tasks.get(task_id)
+        if current and not is_newer(task, current):
+            return
+        if task.get("deleted") or task.get("hidden"):
+            if tasks.pop(task_id, None) is not None:
+                self.version += 1
+            self.task_titles[tasklist_id].remove(task_id)
+            return
+        if self._deleted_locally(task):
+            return
+        if current != task:
+            self.version += 1
+        tasks[task_id] = task
+        self.task_titles[tasklist_id].add(task_id, task.get("title", ""))
+
+    def _forget_tombstones(self):
+        # Once every list synced past a local delete, Google reports it itself
+        if not self.synced_since:
+            return
+        self._forget_tombstones_before(min(self.synced_since.values()))
+
+    ### Local writes ###
+    def upsert_tasklist(self, tasklist: dict):
+        with self.lock:
+            self.version += 1
+            self.tasklists[tasklist["id"]] = tasklist
+            self.list_titles.add(tasklist["id"], tasklist.get("title", ""))
+            if tasklist["id"] not in self.tasks:
+                # A new list starts out empty, no full load needed
+                self.tasks[tasklist["id"]] = {}
+                self.task_titles[tasklist["id"]] = TitleIndex()
+                self.synced_since[tasklist["id"]] = now_rfc3339()
+
+    def remove_tasklist(self, tasklist_id: str):
+        with self.lock:
+            self.version += 1
+            self.tasklists.pop(tasklist_id, None)
+            self.list_titles.remove(tasklist_id)
+            self.tasks.pop(tasklist_id, None)
+            self.task_titles.pop(tasklist_id, None)
+            self.synced_since.pop(tasklist_id, None)
+
+    def upsert_task(self, tasklist_id: str, task: dict):
+        # Called with the API response of insert/update/patch
+        with self.lock:
+            self.version += 1
+            self.deleted.pop(task["id"], None)
+            if tasklist_id not in self.tasks:
+                return  # Not loaded yet, its first load brings the task along
+            self.tasks[tasklist_id][task["id"]] = task
+            self.task_titles[tasklist_id].add(task["id"], task.get("title", ""))
+
+    def remove_task(self, tasklist_id: str, task_id: str):
+        with self.lock:
+            self.version += 1
+            self.deleted[task_id] = now_rfc3339()
+            if tasklist_id not in self.tasks:
+                return
+            self.tasks[tasklist_id].pop(task_id, None)
+            self.task_titles[tasklist_id].remove(task_id)
+
+    ### Local reads ###
+    def has_tasks(self, tasklist_id: str) -> bool:
+        with self.lock:
+            return tasklist_id in self.tasks
+
+    def get_tasklists(self) -> List[dict]:
+        with self.lock:
+            return list(self.tasklists.values())
+
+    def get_tasks(self, tasklist_id: str) -> List[dict]:
+        # Tasks in the order Google shows them
+        with self.lock:
+            tasks = list(self.tasks.get(tasklist_id, {}).values())
+        return sorted(tasks, key=lambda task: (task.get("parent") is not None, task.get("position", "")))
+
+    def search_tasklists(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        with self.lock:
+            return self.list_titles.search(name, limit=limit)
+
+    def search_tasks(self, tasklist_id: str, name: str, task_ids: Optional[List[str]] = None, limit: int = 5) -> List[Tuple[str, float]]:
+        with self.lock:
+            index = self.task_titles.get(tasklist_id)
+            return index.search(name, task_ids, limit) if index else []
+
+    def due_until(self, day: date) -> List[Tuple[dict, dict]]:
+        # Open (task list, task) pairs due on or before the day, earliest first
+        due = []
+        with self.lock:
+            for tasklist_id, tasks in self.tasks.items():
+                for task in tasks.values():
+                    # Google keeps only the date of "due", always at midnight UTC
+                    if task.get("status") != "completed" and task.get("due") and task["due"][:10] <= day.isoformat():
+                        due.append((self.tasklists.get(tasklist_id, {"id": tasklist_id, "title": tasklist_id}), task))
+        return sorted(due, key=lambda pair: pair[1]["due"])
@@ -1,67 +1,130 @@
 from googleapiclient.errors import HttpError
 from googleapiclient.discovery import build
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple, Union
 from tools.authentication import Authenticator
-from todo_logic.models import TodoDetails, ModifyTodoParams, TaskListParams, DeleteTodoParams
+from todo_logic.models import TodoDetails, ModifyTodoParams, TaskListParams, DeleteTodoParams, SearchTodoParams, CreateTodosParams, \
+    TodoByNameParams, CreateTodoInListParams, ModifyTodoByNameParams, ListTodosByNameParams, DueTodosParams
+from todo_logic.task_store import TaskStore
+from calendar_logic.event_store import CALENDAR_TIMEZONE
+from tools.batch import execute_batch
+from tools.async_transport import transport
+from tools.title_index import pick_match
+import asyncio
 
 class TaskManager:
     def __init__(self):
-        # Authenticate and initialize the Google Tasks service
-        self.service = Authenticator.authenticate("todo")
+        # Local copy of all lists and tasks, kept current by a background sync.
+        # Nothing touches the network here, authentication and the first sync start on first use.
+        self.store = TaskStore(lambda: Authenticator.authenticate("todo"))
+
+    def start(self):
+        # Begin syncing the task lists; called by the server warm-up or implicitly on first use
+        self.store.start()
+
+    async def _service(self):
+        # Built in a worker thread on first use, so loading the credentials never blocks the event loop
+        self.start()
+        return await Authenticator.async_authenticate("todo")
+
+    ### Local Copy ###
+    async def _tasklists(self) -> List[dict]:
+        # Served from the local copy; until its first sync is through, loaded right here (off the event loop)
+        if not self.store.ready:
+            await asyncio.to_thread(self.store.load_tasklists, await self._service())
+        return self.store.get_tasklists()
+
+    async def _tasks(self, tasklist_id: str) -> List[dict]:
+        if not self.store.has_tasks(tasklist_id):
+            await asyncio.to_thread(self.store.load_tasks, await self._service(), tasklist_id)
+        return self.store.get_tasks(tasklist_id)
 
     ### Task List Methods ###
-    def create_tasklist(self, title: str) -> str:
+    async def create_tasklist(self, title: str) -> str:
         try:
+            service = await self._service()
             # Create a new task list
             tasklist = {'title': title}
-            result = self.service.tasklists().insert(body=tasklist).execute()
+            result = await transport.execute(service.tasklists().insert(body=tasklist))
+            self.store.upsert_tasklist(result)
             return f"Task list '{title}' created (ID: {result['id']})"
         except HttpError as error:
             return f"Error while creating the task list: {error}"
 
-    def delete_tasklist(self, tasklist_id: str) -> str:
+    async def delete_tasklist(self, tasklist_id: str) -> str:
         try:
+            service = await self._service()
             # Delete a task list by its ID
-            self.service.tasklists().delete(tasklist=tasklist_id).execute()
+            await transport.execute(service.tasklists().delete(tasklist=tasklist_id))
+            self.store.remove_tasklist(tasklist_id)
             return f"Task list with ID '{tasklist_id}' successfully deleted."
         except HttpError as error:
             return f"Error while deleting the task list: {error}"
 
-    def list_tasklists(self) -> str:
+    async def list_tasklists(self) -> str:
         try:
             # Retrieve all task lists
-            results = self.service.tasklists().list().execute()
-            tasklists = results.get("items", [])
+            tasklists = await self._tasklists()
             return "\n".join([f"{tasklist['title']} (ID: {tasklist['id']})" for tasklist in tasklists])
         except HttpError as error:
             return f"Error while retrieving task lists: {error}"
 
     ### Task Methods ###
-    def create_todo(self, todo: TodoDetails) -> str:
+    @staticmethod
+    def _task_body(todo: Union[TodoDetails, CreateTodoInListParams]) -> dict:
+        # Tasks created by name have no status field, they always start open
+        task = {'title': todo.title, 'status': getattr(todo, 'status', None) or 'needsAction'}
+        if todo.notes:
+            task['notes'] = todo.notes
+        if todo.due:
+            task['due'] = todo.due
+        return task
+
+    async def create_todo(self, todo: TodoDetails) -> str:
         try:
+            service = await self._service()
             # Create a new task
-            task = {'title': todo.title, 'status': todo.status or 'needsAction'}
-            if todo.notes:
-                task['notes'] = todo.notes
-            if todo.due:
-                task['due'] = todo.due
-            result = self.service.tasks().insert(tasklist=todo.tasklist_id, body=task).execute()
+            result = await transport.execute(service.tasks().insert(tasklist=todo.tasklist_id, body=self._task_body(todo)))
+            self.store.upsert_task(todo.tasklist_id, result)
             return f"Task '{todo.title}' created (ID: {result['id']})"
         except HttpError as error:
             return f"Error while creating the task: {error}"
 
-    def delete_todo(self, params: DeleteTodoParams) -> str:
+    async def create_todos(self, params: CreateTodosParams) -> str:
+        try:
+            service = await self._service()
+            # All inserts go out in one batch HTTP request
+            requests = []
+            for position, todo in enumerate(params.todos):
+                requests.append((str(position), service.tasks().insert(tasklist=todo.tasklist_id, body=self._task_body(todo))))
+            results = await asyncio.to_thread(execute_batch, service, requests)
+
+            report = []
+            for position, todo in enumerate(params.todos):
+                result, error = results.get(str(position), (None, "no response"))
+                if error:
+                    report.append(f"- {todo.title}: failed: {error}")
+                else:
+                    self.store.upsert_task(todo.tasklist_id, result)
+                    report.append(f"- {todo.title}: created (ID: {result['id']})")
+            return "\n".join(report) if report else "No tasks given."
+        except HttpError as error:
+            return f"Error while creating the tasks: {error}"
+
+    async def delete_todo(self, params: DeleteTodoParams) -> str:
         try:
+            service = await self._service()
             # Delete a task by its ID
-            self.service.tasks().delete(tasklist=params.tasklist_id, task=params.task_id).execute()
+            await transport.execute(service.tasks().delete(tasklist=params.tasklist_id, task=params.task_id))
+            self.store.remove_task(params.tasklist_id, params.task_id)
             return f"Task with ID '{params.task_id}' successfully deleted."
         except HttpError as error:
             return f"Error while deleting the task: {error}"
 
-    def modify_todo(self, params: ModifyTodoParams) -> str:
+    async def modify_todo(self, params: ModifyTodoParams) -> str:
         try:
-            task = self.service.tasks().get(tasklist=params.tasklist_id, task=params.task_id).execute()
+            service = await self._service()
+            task = await transport.execute(service.tasks().get(tasklist=params.tasklist_id, task=params.task_id))
             if params.new_title:
                 task['title'] = params.new_title
             if params.new_notes:
@@ -70,17 +133,195 @@ class TaskManager:
                 task['due'] = params.new_due
             if params.new_status:
                 task['status'] = params.new_status
-            updated_task = self.service.tasks().update(tasklist=params.tasklist_id, task=params.task_id, body=task).execute()
+            updated_task = await transport.execute(service.tasks().update(tasklist=params.tasklist_id, task=params.task_id, body=task))
+            self.store.upsert_task(params.tasklist_id, updated_task)
             return f"Task '{updated_task['title']}' successfully updated."
         except HttpError as error:
             return f"Error while updating the task: {error}"
 
-    def list_todos(self, params: TaskListParams) -> str:
+    async def list_todos(self, params: TaskListParams) -> str:
         try:
-            results = self.service.tasks().list(tasklist=params.tasklist_id).execute()
-            tasks = results.get("items", [])
+            tasks = await self._tasks(params.tasklist_id)
+            if params.max_results:
+                tasks = tasks[:params.max_results]
             if not tasks:
                 return "No tasks found."
             return "\n".join([f"{task['title']} (ID: {task['id']})" for task in tasks])
         except HttpError as error:
             return f"Error while retrieving tasks: {error}"
+
+    async def search_todos(self, params: SearchTodoParams) -> str:
+        try:
+            # Rank the tasks of the list by title similarity instead of taking the first substring hit
+            tasks = {task["id"]: task for task in await self._tasks(params.tasklist_id)}
+            ranked = self.store.search_tasks(params.tasklist_id, params.query)
+
+            match, candidates = pick_match(ranked)
+            if not candidates:
+                return "No matching task found."
+            candidate_list = [f"{tasks[key]['title']} (ID: {key}, match: {score:.2f})" for key, score in candidates]
+            if match:
+                return "Best match:\n" + "\n".join(candidate_list[:1])
+            return "Several tasks match, ask the user which one is meant:\n" + "\n".join(candidate_list)
+        except HttpError as error:
+            return f"Error while searching tasks: {error}"
+
+    ### Name Resolution ###
+    async def _resolve_tasklist(self, list_name: Optional[str]) -> Tuple[Optional[dict], str]:
+        # Returns (task list, "") or (None, message for the agent)
+        tasklists = await self._tasklists()
+        if not tasklists:
+            return None, "No task lists found."
+        if not list_name:
+            # Google lists the default list first
+            return tasklists[0], ""
+        by_id = {tasklist["id"]: tasklist for tasklist in tasklists}
+        match, candidates = pick_match(self.store.search_tasklists(list_name))
+        if match:
+            return by_id[match], ""
+        if candidates:
+            names = "\n".join(f"- {by_id[key]['title']}" for key, _ in candidates if key in by_id)
+            return None, f"Several task lists match '{list_name}', ask the user which one is meant:\n{names}"
+        names = ", ".join(tasklist["title"] for tasklist in tasklists)
+        return None, f"No task list named '{list_name}' found. Existing lists: {names}"
+
+    async def find_tasklist(self, list_name: Optional[str]) -> Optional[dict]:
+        # Only a clear match, None when the name is unknown or ambiguous
+        tasklist, _ = await self._resolve_tasklist(list_name)
+        return tasklist
+
+    async def open_tasks(self, tasklist_id: str) -> List[dict]:
+        return [task for task in await self._tasks(tasklist_id) if task.get("status") != "completed"]
+
+    async def _resolve_task(self, tasklist: dict, task_name: str, open_only: bool = False) -> Tuple[Optional[dict], str]:
+        tasks = {task["id"]: task for task in await self._tasks(tasklist["id"])}
+        # Completing prefers the open task over an already finished one with the same title
+        task_ids = [task_id for task_id, task in tasks.items() if task.get("status") != "completed"] if open_only else None
+        match, candidates = pick_match(self.store.search_tasks(tasklist["id"], task_name, task_ids))
+        if match:
+            return tasks[match], ""
+        if candidates:
+            names = "\n".join(f"- {tasks[key]['title']}" for key, _ in candidates if key in tasks)
+            return None, f"Several tasks in '{tasklist['title']}' match '{task_name}', ask the user which one is meant:\n{names}"
+        return None, f"No task matching '{task_name}' found in '{tasklist['title']}'."
+
+    def _forget_missing(self, error: HttpError, tasklist_id: str, task_id: str):
+        # The local copy was stale: the task is gone upstream
+        if error.resp.status == 404:
+            self.store.remove_task(tasklist_id, task_id)
+
+    ### Name-based Task Methods ###
+    async def create_todo_in_list(self, params: CreateTodoInListParams) -> str:
+        try:
+            service = await self._service()
+            tasklist, message = await self._resolve_tasklist(params.list_name)
+            if not tasklist:
+                return message
+            result = await transport.execute(service.tasks().insert(tasklist=tasklist['id'], body=self._task_body(params)))
+            self.store.upsert_task(tasklist['id'], result)
+            return f"Task '{params.title}' created in '{tasklist['title']}'."
+        except HttpError as error:
+            return f"Error while creating the task: {error}"
+
+    async def list_todos_in_list(self, params: ListTodosByNameParams) -> str:
+        try:
+            tasklist, message = await self._resolve_tasklist(params.list_name)
+            if not tasklist:
+                return message
+            tasks = await self._tasks(tasklist['id'])
+            if params.max_results:
+                tasks = tasks[:params.max_results]
+            if not tasks:
+                return f"No tasks in '{tasklist['title']}'."
+            lines = [f"- {task['title']}" + (" (completed)" if task.get('status') == 'completed' else "") for task in tasks]
+            return f"{tasklist['title']}:\n" + "\n".join(lines)
+        except HttpError as error:
+            return f"Error while retrieving tasks: {error}"
+
+    async def modify_todo_by_name(self, params: ModifyTodoByNameParams) -> str:
+        try:
+            service = await self._service()
+            tasklist, message = await self._resolve_tasklist(params.list_name)
+            if not tasklist:
+                return message
+            task, message = await self._resolve_task(tasklist, params.task_name)
+            if not task:
+                return message
+            # Patch sends only the changed fields, no get round trip needed
+            changes = {}
+            if params.new_title:
+                changes['title'] = params.new_title
+            if params.new_notes:
+                changes['notes'] = params.new_notes
+            if params.new_due:
+                changes['due'] = params.new_due
+            if params.new_status:
+                changes['status'] = params.new_status
+            if not changes:
+                return "Nothing to change."
+            try:
+                updated_task = await transport.execute(service.tasks().patch(tasklist=tasklist['id'], task=task['id'], body=changes))
+            except HttpError as error:
+                self._forget_missing(error, tasklist['id'], task['id'])
+                raise
+            self.store.upsert_task(tasklist['id'], updated_task)
+            return f"Task '{updated_task['title']}' successfully updated."
+        except HttpError as error:
+            return f"Error while updating the task: {error}"
+
+    async def complete_todo_by_name(self, params: TodoByNameParams) -> str:
+        try:
+            service = await self._service()
+            tasklist, message = await self._resolve_tasklist(params.list_name)
+            if not tasklist:
+                return message
+            task, message = await self._resolve_task(tasklist, params.task_name, open_only=True)
+            if not task:
+                return message
+            try:
+                updated_task = await transport.execute(service.tasks().patch(tasklist=tasklist['id'], task=task['id'], body={'status': 'completed'}))
+            except HttpError as error:
+                self._forget_missing(error, tasklist['id'], task['id'])
+                raise
+            self.store.upsert_task(tasklist['id'], updated_task)
+            return f"Task '{updated_task['title']}' marked as completed."
+        except HttpError as error:
+            return f"Error while completing the task: {error}"
+
+    async def delete_todo_by_name(self, params: TodoByNameParams) -> str:
+        try:
+            service = await self._service()
+            tasklist, message = await self._resolve_tasklist(params.list_name)
+            if not tasklist:
+                return message
+            task, message = await self._resolve_task(tasklist, params.task_name)
+            if not task:
+                return message
+            try:
+                await transport.execute(service.tasks().delete(tasklist=tasklist['id'], task=task['id']))
+            except HttpError as error:
+                self._forget_missing(error, tasklist['id'], task['id'])
+                raise
+            self.store.remove_task(tasklist['id'], task['id'])
+            return f"Task '{task['title']}' deleted from '{tasklist['title']}'."
+        except HttpError as error:
+            return f"Error while deleting the task: {error}"
+
+    async def list_due_todos(self, params: DueTodosParams) -> str:
+        try:
+            day = datetime.fromisoformat(params.date).date() if params.date else datetime.now(CALENDAR_TIMEZONE).date()
+        except ValueError:
+            return f"Invalid date '{params.date}', expected YYYY-MM-DD."
+        try:
+            for tasklist in await self._tasklists():
+                await self._tasks(tasklist['id'])
+            due = self.store.due_until(day)
+        except HttpError as error:
+            return f"Error while retrieving tasks: {error}"
+        if not due:
+            return f"No open tasks due by {day.isoformat()}."
+        lines = []
+        for tasklist, task in due:
+            overdue = " (overdue)" if task['due'][:10] < day.isoformat() else ""
+            lines.append(f"- {task['title']} [{tasklist['title']}], due {task['due'][:10]}{overdue}")
+        return "\n".join(lines)
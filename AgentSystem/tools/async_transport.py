@@ -0,0 +1,86 @@
+import asyncio
+import importlib.util
+import os
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+import httplib2
+from tools.authentication import Authenticator
+from tools.metrics import record_google_request
+from tools.tracing import span
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2]), otherwise HTTP/1.1 keep-alive is used
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# Open connections per Google API host, shared by all sessions
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("LYRA_GOOGLE_MAX_CONNECTIONS", "8"))
+REQUEST_TIMEOUT = float(os.getenv("LYRA_GOOGLE_TIMEOUT", "30"))
+
+
+class AsyncGoogleTransport:
+    """
+    Executes googleapiclient requests on a shared httpx connection pool instead of httplib2.
+    The discovery-built HttpRequest still provides URL, method, headers and body, and its postproc
+    parses the response, so results and HttpErrors look exactly like request.execute().
+    Every host gets its own pooled client, which caps the connections per host.
+    """
+
+    def __init__(self, max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST, timeout: float = REQUEST_TIMEOUT):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _client(self, host: str) -> httpx.AsyncClient:
+        # httpx clients belong to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._clients = {}
+            self._loop = loop
+        client = self._clients.get(host)
+        if client is None:
+            client = self._clients[host] = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_connections_per_host
+                )
+            )
+        return client
+
+    async def execute(self, request):
+        creds = Authenticator.credential_store.creds
+        if creds is None or not creds.valid:
+            # Normally the background refresh got there first
+            creds = await asyncio.to_thread(Authenticator.credential_store.get)
+        headers = dict(request.headers)
+        creds.apply(headers)
+
+        host = urlsplit(request.uri).netloc
+        with span(getattr(request, "methodId", None) or request.method, "google", host=host) as current:
+            try:
+                response = await self._client(host).request(
+                    request.method,
+                    request.uri,
+                    content=request.body,
+                    headers=headers
+                )
+            except httpx.HTTPError:
+                record_google_request(request.uri, None)
+                raise
+            record_google_request(request.uri, response.status_code)
+            if current:
+                current.attributes["status"] = response.status_code
+            info = dict(response.headers)
+            info["status"] = str(response.status_code)
+            # Raises HttpError for error responses, like execute() does
+            return request.postproc(httplib2.Response(info), response.content)
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+# One pool for the whole process
+transport = AsyncGoogleTransport()
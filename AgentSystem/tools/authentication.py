@@ -1,4 +1,8 @@
+import asyncio
 import os
+import threading
+import time
+from datetime import datetime, timedelta
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -12,71 +16,174 @@ SCOPES = [
     "https://www.googleapis.com/auth/tasks"
 ]
 
-class Authenticator:
-    @staticmethod
-    def authenticate(auth_type):
-        creds = None
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        credentials_path = os.path.join(script_dir, 'credentials.json')
-        token_path = os.path.join(script_dir, 'token.json')
+# Das Token wird so lange vor Ablauf im Hintergrund erneuert
+REFRESH_MARGIN = timedelta(minutes=5)
+# Wartezeit nach einem fehlgeschlagenen Hintergrund-Refresh
+REFRESH_RETRY_SECONDS = 60
 
-        # === OAuth für Calendar & Tasks ===
-        if auth_type in ["event", "todo"]:
-            # Falls token.json existiert, laden
-            if os.path.exists(token_path):
-                creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-
-            # Token ist abgelaufen oder existiert nicht
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    # Versuch, das Token zu aktualisieren
-                    try:
-                        creds.refresh(Request())
-                    except Exception as e:
-                        print("Token-Refresh fehlgeschlagen:", str(e))
-                        creds = None
-                if not creds:
-                    # Erneuter OAuth-Flow mit dauerhafter Berechtigung
-                    try:
-                        flow = InstalledAppFlow.from_client_secrets_file(
-                            credentials_path, SCOPES)
-                        creds = flow.run_local_server(
-                            port=0,
-                            access_type='offline',  # unbedingt nötig für Refresh-Token
-                            prompt='consent'        # erzwingt neue Erlaubnis + Refresh-Token
-                        )
-                    except Exception as e:
-                        print("OAuth-Authentifizierung fehlgeschlagen:", str(e))
-                        return None
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-                # Speichern des neuen Tokens
-                with open(token_path, "w") as token:
-                    token.write(creds.to_json())
+# API name and version per auth type, built from the discovery documents shipped with the client library
+SERVICES = {
+    "event": ("calendar", "v3"),
+    "todo": ("tasks", "v1"),
+}
 
-            # Passenden Google-Service zurückgeben
-            if auth_type == "event":
-                return build("calendar", "v3", credentials=creds)
-            elif auth_type == "todo":
-                return build("tasks", "v1", credentials=creds)
 
-        # === Google Cloud Service Accounts (für TTS & STT) ===
-        elif auth_type == "tts":
+class CredentialStore:
+    """
+    Process-wide OAuth credentials for Calendar and Tasks.
+    token.json is read once; afterwards a background thread refreshes the token shortly before it
+    expires, so no request ever waits for a refresh. All services share the same Credentials object,
+    which the refresh updates in place.
+    """
+
+    def __init__(self, token_path: str, credentials_path: str, scopes=SCOPES, refresh_margin: timedelta = REFRESH_MARGIN):
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.creds = None
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def get(self):
+        with self.lock:
+            if self.creds is None or not self.creds.valid:
+                self.creds = self._load()
+                if self.creds:
+                    self._save()
+            if self.creds and not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._refresh_loop, name="oauth-refresh", daemon=True)
+                self._thread.start()
+            return self.creds
+
+    def _load(self):
+        creds = self.creds
+        # Falls token.json existiert, laden
+        if creds is None and os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, self.scopes)
+
+        if creds and creds.valid:
+            return creds
+        if creds and creds.expired and creds.refresh_token:
+            # Versuch, das Token zu aktualisieren
             try:
-                service_key_path = os.path.join(script_dir, "service_key.json")
-                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = service_key_path
-                return texttospeech.TextToSpeechClient()
+                creds.refresh(Request())
+                return creds
             except Exception as e:
-                print("TTS-Authentifizierung fehlgeschlagen:", str(e))
-                return None
+                print("Token-Refresh fehlgeschlagen:", str(e))
+
+        # Erneuter OAuth-Flow mit dauerhafter Berechtigung
+        try:
+            flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, self.scopes)
+            return flow.run_local_server(
+                port=0,
+                access_type='offline',  # unbedingt nötig für Refresh-Token
+                prompt='consent'        # erzwingt neue Erlaubnis + Refresh-Token
+            )
+        except Exception as e:
+            print("OAuth-Authentifizierung fehlgeschlagen:", str(e))
+            return None
+
+    def _save(self):
+        # Speichern des neuen Tokens
+        with open(self.token_path, "w") as token:
+            token.write(self.creds.to_json())
 
-        elif auth_type == "stt":
+    def _refresh_loop(self):
+        while True:
+            with self.lock:
+                creds = self.creds
+            if creds is None or not creds.refresh_token:
+                return
+            # expiry is naive UTC in google-auth
+            wait = (creds.expiry - datetime.utcnow() - self.refresh_margin).total_seconds() if creds.expiry else 0
+            time.sleep(max(wait, 0))
             try:
-                service_key_path = os.path.join(script_dir, "service_key.json")
-                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = service_key_path
-                return speech.SpeechClient()
+                with self.lock:
+                    self.creds.refresh(Request())
+                    self._save()
             except Exception as e:
-                print("STT-Authentifizierung fehlgeschlagen:", str(e))
-                return None
+                print("⚠️ Token-Refresh im Hintergrund fehlgeschlagen:", str(e))
+                time.sleep(REFRESH_RETRY_SECONDS)
+
+
+class Authenticator:
+    credential_store = CredentialStore(
+        token_path=os.path.join(SCRIPT_DIR, 'token.json'),
+        credentials_path=os.path.join(SCRIPT_DIR, 'credentials.json')
+    )
+    # Built services per thread, httplib2 connections must not be shared between threads
+    _local = threading.local()
+    # gRPC clients are thread-safe, one per process is enough
+    _clients = {}
+    _clients_lock = threading.Lock()
+
+    @staticmethod
+    def authenticate(auth_type):
+        # === OAuth für Calendar & Tasks ===
+        if auth_type in SERVICES:
+            services = Authenticator._services()
+            if auth_type not in services:
+                service = Authenticator._build_service(auth_type)
+                if service is None:
+                    return None
+                services[auth_type] = service
+            return services[auth_type]
+
+        # === Google Cloud Service Accounts (für TTS & STT) ===
+        elif auth_type in ["tts", "stt"]:
+            with Authenticator._clients_lock:
+                if auth_type not in Authenticator._clients:
+                    client = Authenticator._create_client(auth_type)
+                    if client is None:
+                        return None
+                    Authenticator._clients[auth_type] = client
+                return Authenticator._clients[auth_type]
 
         else:
             raise Exception("Ungültiger Authentifizierungs-Typ angegeben.")
+
+    @staticmethod
+    async def async_authenticate(auth_type):
+        """
+        Like authenticate, for the event-loop thread: the first build (credentials, possibly a token refresh
+        or the OAuth flow, the discovery document) runs in a worker thread. The service only builds requests
+        there, they are sent through the async transport or a worker thread's own Http.
+        """
+        services = Authenticator._services()
+        if auth_type not in services:
+            service = await asyncio.to_thread(Authenticator._build_service, auth_type)
+            if service is None:
+                return None
+            services.setdefault(auth_type, service)
+        return services[auth_type]
+
+    @staticmethod
+    def _services():
+        services = getattr(Authenticator._local, "services", None)
+        if services is None:
+            services = Authenticator._local.services = {}
+        return services
+
+    @staticmethod
+    def _build_service(auth_type):
+        creds = Authenticator.credential_store.get()
+        if not creds:
+            return None
+        api, version = SERVICES[auth_type]
+        # Offline discovery document, no round trip to the discovery endpoint
+        return build(api, version, credentials=creds, static_discovery=True, cache_discovery=False)
+
+    @staticmethod
+    def _create_client(auth_type):
+        try:
+            service_key_path = os.path.join(SCRIPT_DIR, "service_key.json")
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = service_key_path
+            if auth_type == "tts":
+                return texttospeech.TextToSpeechClient()
+            return speech.SpeechClient()
+        except Exception as e:
+            print(f"{auth_type.upper()}-Authentifizierung fehlgeschlagen:", str(e))
+            return None
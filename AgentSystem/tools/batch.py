@@ -0,0 +1,25 @@
+from typing import Dict, List, Optional, Tuple
+from tools.pagination import thread_http
+
+# Google recommends at most 50 calls per batch request for Calendar and Tasks
+BATCH_LIMIT = 50
+
+
+def execute_batch(service, requests: List[Tuple[str, object]], chunk_size: int = BATCH_LIMIT) -> Dict[str, Tuple[Optional[dict], Optional[Exception]]]:
+    """
+    Sends many API calls in one BatchHttpRequest (one per chunk_size calls).
+    `requests` are (request ID, HttpRequest) pairs; returns request ID → (response, exception),
+    so every item reports its own success or error.
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    for offset in range(0, len(requests), chunk_size):
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, request in requests[offset:offset + chunk_size]:
+            batch.add(request, request_id=request_id)
+        # Safe to call from worker threads, like the paginated listings
+        batch.execute(http=thread_http(service))
+    return results
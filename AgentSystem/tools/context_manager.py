@@ -1,24 +1,158 @@
+import asyncio
+import os
 import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+from agent.agent_summary import summarize_turns
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # Tokenizer der gpt-4o-Modelle
+except Exception:
+    _encoding = None
+
+# Token-Budget der History im Prompt, ältere Einträge fallen heraus
+MAX_CONTEXT_TOKENS = int(os.getenv("LYRA_CONTEXT_TOKENS", "1500"))
+# Obergrenze für die Anzahl der Einträge, unabhängig vom Budget
+MAX_CONTEXT_ENTRIES = 50
+# Ab so vielen Tokens werden ältere Turns im Hintergrund zusammengefasst
+COMPACT_THRESHOLD_TOKENS = int(os.getenv("LYRA_CONTEXT_COMPACT_TOKENS", "600"))
+# Die letzten Einträge (User + Assistant) bleiben immer wörtlich im Prompt
+KEEP_RECENT_ENTRIES = 4
+# Nach so vielen Sekunden Pause wandern auch die letzten Turns in die Zusammenfassung
+IDLE_SECONDS = float(os.getenv("LYRA_CONTEXT_IDLE_SECONDS", "120"))
+
+Summarizer = Callable[[str, List[str]], Awaitable[str]]
+
+
+def count_tokens(text: str) -> int:
+    # Exakt mit tiktoken, sonst die übliche Schätzung von etwa 4 Zeichen pro Token
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
 
 class ContextManager:
-    def __init__(self):
-        self.context = []
+    """
+    Conversation history of one session: a running summary of older turns plus the last turns verbatim.
+    Once the turns exceed the compaction threshold, the older ones are summarized by a small model
+    in the background; the request that crossed the threshold does not wait for it.
+    The token budget stays as a hard limit, turns it pushes out are folded into the next summary.
+    """
+
+    def __init__(self, max_tokens: int = MAX_CONTEXT_TOKENS, max_entries: int = MAX_CONTEXT_ENTRIES,
+                 compact_threshold: int = COMPACT_THRESHOLD_TOKENS, keep_recent: int = KEEP_RECENT_ENTRIES,
+                 idle_seconds: float = IDLE_SECONDS, summarizer: Optional[Summarizer] = None):
+        self.max_tokens = max_tokens
+        self.max_entries = max_entries
+        self.compact_threshold = compact_threshold
+        self.keep_recent = keep_recent
+        self.idle_seconds = idle_seconds
+        self.summarizer = summarizer or summarize_turns
+        self.context = deque()  # Einträge mit role, content, line und tokens
+        self.tokens = 0
+        self.history_text = ""  # Serialisierte Einträge, wird bei jedem Update fortgeschrieben
+        self.summary = ""  # Zusammenfassung der älteren Turns
+        self.evicted: List[dict] = []  # Vom Budget verdrängt, aber noch nicht zusammengefasst
         self.last_update_time = None  # Zeitstempel des letzten Updates
+        self._compaction: Optional[asyncio.Task] = None
 
     def update_context(self, role, message):
-        current_time = time.time()
-        self.last_update_time = current_time
+        self.last_update_time = time.time()
+        self._append(role, message)
+
+        # Älteste Einträge entfernen, bis Budget und Obergrenze eingehalten sind; der neueste bleibt immer
+        while len(self.context) > 1 and (self.tokens > self.max_tokens or len(self.context) > self.max_entries):
+            self.evicted.append(self._pop_oldest())
+
+        if self.tokens >= self.compact_threshold:
+            self.schedule_compaction(self.keep_recent)
+
+    @staticmethod
+    def _entry(role, message) -> dict:
+        line = f"{role}: {message}"
+        return {"role": role, "content": message, "line": line, "tokens": count_tokens(line)}
 
-        self.context.append({"role": role, "content": message})
-        if len(self.context) > 10:
-            self.context.pop(0)
+    def _append(self, role, message):
+        entry = self._entry(role, message)
+        self.context.append(entry)
+        self.tokens += entry["tokens"]
+        self.history_text = f"{self.history_text}\n{entry['line']}" if self.history_text else entry["line"]
+
+    def _pop_oldest(self) -> dict:
+        oldest = self.context.popleft()
+        self.tokens -= oldest["tokens"]
+        self.history_text = self.history_text[len(oldest["line"]) + 1:]
+        return oldest
+
+    @property
+    def idle(self) -> bool:
+        return self.last_update_time is not None and (time.time() - self.last_update_time) > self.idle_seconds
+
+    @property
+    def has_recent_turns(self) -> bool:
+        # Turns a new question could refer to; after a pause only the summary is left
+        return bool(self.context) and not self.idle
+
+    ### Compaction ###
+    def schedule_compaction(self, keep: int):
+        # Summarize everything except the last `keep` entries, in the background
+        if self._compaction and not self._compaction.done():
+            return
+        entries = self.evicted + list(self.context)[:max(0, len(self.context) - keep)]
+        if not entries:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Ohne Event-Loop bleibt es bei der harten Grenze
+        self._compaction = loop.create_task(self.compact(entries))
+
+    async def compact(self, entries: List[dict]):
+        try:
+            summary = await self.summarizer(self.summary, [entry["line"] for entry in entries])
+        except Exception as e:
+            print("⚠️ Kontext-Zusammenfassung fehlgeschlagen:", str(e))
+            return
+        if not summary:
+            return
+
+        # Turns added while the summary was generated stay untouched
+        folded = {id(entry) for entry in entries}
+        self.evicted = [entry for entry in self.evicted if id(entry) not in folded]
+        while self.context and id(self.context[0]) in folded:
+            self._pop_oldest()
+        self.summary = summary
+        print(f"🗜️ Kontext zusammengefasst: {len(entries)} Einträge, {self.tokens} Tokens verbleiben")
+
+    ### Persistence ###
+    def to_dict(self) -> dict:
+        # Turns not summarized yet are kept as well, the next compaction after a reload folds them
+        return {
+            "summary": self.summary,
+            "evicted": [{"role": entry["role"], "content": entry["content"]} for entry in self.evicted],
+            "entries": [{"role": entry["role"], "content": entry["content"]} for entry in self.context],
+            "last_update_time": self.last_update_time,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs) -> "ContextManager":
+        context_manager = cls(**kwargs)
+        context_manager.summary = data.get("summary", "")
+        for entry in data.get("entries", []):
+            context_manager._append(entry["role"], entry["content"])
+        context_manager.evicted = [cls._entry(entry["role"], entry["content"]) for entry in data.get("evicted", [])]
+        context_manager.last_update_time = data.get("last_update_time")
+        return context_manager
 
     def get_context_summary(self):
-        current_time = time.time()
-
-        # Wenn das letzte Update mehr als 2 Minuten zurückliegt, lösche den Kontext
-        if self.last_update_time is None or (current_time - self.last_update_time) > 120:
-            self.context = []
-            return ""
-        
-        return "\n".join([f"{entry['role']}: {entry['content']}" for entry in self.context])
+        # Nach einer Pause wird der Kontext nicht mehr gelöscht, sondern zusammengefasst
+        if self.idle and self.context:
+            self.schedule_compaction(0)
+
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        if self.history_text:
+            parts.append(self.history_text)
+        return "\n".join(parts)
@@ -0,0 +1,154 @@
+import math
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from tools.title_index import normalize_title, tokenize
+
+# Routes below this lead over the runner-up go to the coordinator agent
+MIN_CONFIDENCE = float(os.getenv("LYRA_ROUTER_MIN_CONFIDENCE", "0.2"))
+# ...and so do routes below this score: a specialist has no web search and cannot hand the turn back,
+# so a lead over weak scores ("Book a flight to London on Monday") is not enough
+MIN_SCORE = float(os.getenv("LYRA_ROUTER_MIN_SCORE", "0.5"))
+# Weight of the keyword rules against the n-gram similarity
+RULE_WEIGHT = 0.6
+# Replies up to this many words stay with the specialist of the previous turn ("am Freitag"),
+# if that specialist still leads the general intent by MIN_CONFIDENCE; "Ja bitte" or "Suche im Internet" do not
+FOLLOW_UP_MAX_WORDS = 4
+VECTOR_DIMENSIONS = 1 << 14
+
+# Keyword rules per intent: (pattern, weight); the weights of all hits add up to at most 1
+RULES: Dict[str, List[Tuple[str, float]]] = {
+    "appointment": [
+        (r"\b(termin\w*|kalender\w*|meeting\w*|besprechung\w*|appointment\w*|calendar|event\w*)\b", 0.7),
+        (r"\b(verschieb\w*|verleg\w*|reschedul\w*|absag\w*|cancel\w*)\b", 0.3),
+        (r"\b(frei|verfugbar|zeit fur|free|available|availability)\b", 0.3),
+        (r"\b(um \d{1,2}(:\d\d)? ?(uhr)?|at \d{1,2}(:\d\d)? ?(am|pm)?|\d{1,2} uhr)\b", 0.3),
+        (r"\b(habe?|bin|am) ich\b.*\b(zeit|frei|free|busy)\b", 0.5),
+        (r"\b(trag\w*|eintragen|book|schedul\w*)\b", 0.3),
+        (r"\b(montag|dienstag|mittwoch|donnerstag|freitag|samstag|sonntag|monday|tuesday|wednesday|thursday|friday|saturday|sunday|noon|mittag)\b", 0.2),
+    ],
+    "todo": [
+        (r"\b(aufgabe\w*|todo\w*|to-?dos?|task\w*|erledig\w*|abhak\w*|einkaufsliste\w*|shopping list|grocer\w*)\b", 0.7),
+        (r"\bhak\w*\b.*\bab\b", 0.6),
+        (r"\b(liste\w*|list|lists)\b", 0.3),
+        (r"\b(auf die|zur|on the|to the|to my) \w*\s?(liste|list)\b", 0.4),
+        (r"\b(kaufen|besorgen|buy|done|fertig)\b", 0.2),
+    ],
+}
+
+# Example utterances per intent for the n-gram similarity
+EXAMPLES: Dict[str, List[str]] = {
+    "appointment": [
+        "Trag mir morgen um 15 Uhr einen Termin beim Zahnarzt ein",
+        "Was steht heute in meinem Kalender",
+        "Verschieb das Meeting mit Anna auf Freitag",
+        "Lösche meinen Termin am Montag",
+        "Habe ich am Donnerstag Nachmittag Zeit",
+        "Wann habe ich nächste Woche eine Stunde frei",
+        "Welche Termine habe ich morgen",
+        "Schedule a call with Tom tomorrow at 10",
+        "What's on my calendar today",
+        "Move my dentist appointment to next week",
+        "Cancel the meeting on Friday",
+        "Am I free on Thursday afternoon",
+    ],
+    "todo": [
+        "Setz Milch auf die Einkaufsliste",
+        "Markiere Steuererklärung als erledigt",
+        "Was steht auf meiner Einkaufsliste",
+        "Erstelle eine neue Liste für den Urlaub",
+        "Lösche die Aufgabe Auto waschen",
+        "Welche Aufgaben sind heute fällig",
+        "Zeig mir meine To-dos",
+        "Add eggs to my shopping list",
+        "Mark the laundry task as done",
+        "What's on my todo list",
+        "Remove bread from the list",
+        "Which tasks are due today",
+    ],
+    "general": [
+        "Wie wird das Wetter morgen in Berlin",
+        "Erzähl mir einen Witz",
+        "Wer hat gestern das Spiel gewonnen",
+        "Was ist die Hauptstadt von Australien",
+        "Wie geht es dir",
+        "Was gibt es Neues in den Nachrichten",
+        "Rechne mir 15 Prozent von 80 aus",
+        "What's the weather like tomorrow",
+        "Tell me a joke",
+        "Who won the game last night",
+        "How are you doing",
+        "What are today's headlines",
+    ],
+}
+
+
+class RouteDecision(NamedTuple):
+    intent: str          # "appointment", "todo" or "general"
+    confidence: float    # lead of the best intent over the runner-up
+    scores: Dict[str, float]
+    follow_up: bool = False  # short reply to the previous turn's specialist
+
+    @property
+    def direct(self) -> bool:
+        # Whether a specialist can take the turn without the coordinator
+        if self.intent == "general":
+            return False
+        return self.follow_up or (self.confidence >= MIN_CONFIDENCE and self.scores[self.intent] >= MIN_SCORE)
+
+
+def ngram_vector(text: str) -> Dict[int, float]:
+    # Hashed character 3- to 5-grams, L2-normalized; crc32 keeps the buckets stable across runs
+    text = " " + " ".join(tokenize(text)) + " "
+    counts = defaultdict(float)
+    for size in (3, 4, 5):
+        for i in range(len(text) - size + 1):
+            counts[zlib.crc32(text[i:i + size].encode()) % VECTOR_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    return {bucket: value / norm for bucket, value in counts.items()} if norm else {}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+
+class IntentRouter:
+    """
+    Decides locally whether a transcript clearly belongs to the appointment or the todo agent,
+    so the turn can skip the coordinator's handoff round trip.
+    Keyword rules and the cosine similarity to the nearest example utterance of each intent
+    (hashed character n-grams) are blended into one score per intent; only a high score with a clear lead,
+    or a short reply to the previous specialist, routes directly. Everything else stays with the coordinator.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]] = EXAMPLES, rules: Dict[str, List[Tuple[str, float]]] = RULES):
+        self.examples = {intent: [ngram_vector(text) for text in texts] for intent, texts in examples.items()}
+        self.rules = {intent: [(re.compile(pattern), weight) for pattern, weight in patterns] for intent, patterns in rules.items()}
+
+    def route(self, text: str, previous_intent: Optional[str] = None) -> RouteDecision:
+        normalized = normalize_title(text)
+        vector = ngram_vector(text)
+
+        scores = {}
+        for intent, examples in self.examples.items():
+            rule_score = min(1.0, sum(weight for pattern, weight in self.rules.get(intent, []) if pattern.search(normalized)))
+            similarity = max((cosine(vector, example) for example in examples), default=0.0)
+            scores[intent] = round(RULE_WEIGHT * rule_score + (1 - RULE_WEIGHT) * similarity, 3)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        confidence = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else ranked[0][1]
+        decision = RouteDecision(ranked[0][0], round(confidence, 3), scores)
+
+        # Short answers carry too little text to score, they continue the previous conversation
+        if (previous_intent in scores and previous_intent != "general" and not decision.direct
+                and len(tokenize(text)) <= FOLLOW_UP_MAX_WORDS and scores[previous_intent] == ranked[0][1]
+                and scores[previous_intent] - scores.get("general", 0.0) >= MIN_CONFIDENCE):
+            decision = RouteDecision(previous_intent, decision.confidence, scores, follow_up=True)
+        target = decision.intent if decision.direct else "coordinator"
+        follow_up = ", follow-up" if decision.follow_up else ""
+        print(f"🧭 Routing → {target} (intent {decision.intent}, confidence {decision.confidence:.2f}{follow_up}, scores {scores})")
+        return decision
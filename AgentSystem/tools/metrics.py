@@ -0,0 +1,217 @@
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Latency buckets in seconds, from a cache hit up to a slow multi-tool turn
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds between two event-loop lag probes
+LOOP_LAG_INTERVAL = 0.5
+
+LabelKey = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelKey, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Sharded:
+    """
+    Base for counters and histograms: every thread writes only its own shard, so recording needs no lock.
+    A scrape sums the shards; dict.copy() is atomic under the GIL, so it sees a consistent shard.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()  # Only taken once per thread, when its shard is created
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _key(self, labels: dict) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def collect(self) -> Dict[LabelKey, float]:
+        totals: Dict[LabelKey, float] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in sorted(self.collect().items())]
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        # Per bucket count (last slot: above all buckets), then sum
+        slots = shard.get(key)
+        if slots is None:
+            slots = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        slots[bisect_left(self.buckets, value)] += 1
+        slots[-1] += value
+
+    def collect(self) -> Dict[LabelKey, list]:
+        totals: Dict[LabelKey, list] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, slots in shard.copy().items():
+                slots = list(slots)
+                total = totals.setdefault(key, [0] * len(slots))
+                for index, value in enumerate(slots):
+                    total[index] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, slots in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), slots[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(slots[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Value read at scrape time, e.g. the number of sessions or the stats of a cache."""
+
+    def __init__(self, name: str, help_text: str, metric_type: str, callback: Callable[[], Dict[LabelKey, float]],
+                 labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.type = metric_type
+        self.callback = callback
+        self.labels = labels
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"⚠️ Metrik {self.name} nicht lesbar:", str(e))
+            return []
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name: str, help_text: str, metric_type: str, callback: Callable[[], Dict[LabelKey, float]],
+                 labels: Tuple[str, ...] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, metric_type, callback, labels))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], float]) -> CallbackMetric:
+        return self.callback(name, help_text, "gauge", lambda: {(): callback()})
+
+    def _register(self, metric):
+        # Registering twice (e.g. a module reloaded by the dev server) replaces the old metric
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# One registry for the whole process
+registry = MetricsRegistry()
+
+requests_total = registry.counter("lyra_requests_total", "Answered utterances.", ("outcome",))
+request_seconds = registry.histogram("lyra_request_seconds", "Time from the start of an utterance to the end of its reply.")
+first_audio_seconds = registry.histogram("lyra_first_audio_seconds", "Time from the start of an utterance to its first audio segment.")
+stage_seconds = registry.histogram("lyra_stage_seconds", "Duration of the spans of a request, by kind.", ("stage",))
+google_requests_total = registry.counter("lyra_google_requests_total", "Google API requests, including background syncs.", ("api",))
+google_errors_total = registry.counter("lyra_google_errors_total", "Google API requests that failed or returned an error status.", ("api", "status"))
+tts_bytes_total = registry.counter("lyra_tts_bytes_total", "Bytes of synthesized audio, including cache hits.")
+stt_bytes_total = registry.counter("lyra_stt_bytes_total", "Bytes of audio sent to speech recognition.")
+loop_lag_seconds = registry.histogram("lyra_event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up.",
+                                      buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+_loop_lag = {"last": 0.0}
+registry.gauge("lyra_event_loop_lag_last_seconds", "Event-loop lag of the latest probe.", lambda: _loop_lag["last"])
+
+
+def record_google_request(uri: str, status: Optional[int]):
+    # Labelled by API ("calendar", "tasks", "batch"), not by URL, to keep the series few.
+    # status None: no response at all (timeout, connection error)
+    api = urlsplit(uri).path.strip("/").split("/")[0] or "unknown"
+    google_requests_total.inc(api=api)
+    if status is None or status >= 400:
+        google_errors_total.inc(api=api, status=status or "none")
+
+
+def observe_trace(trace):
+    # Request count and stage latencies of one finished request trace
+    requests_total.inc(outcome="ok" if "first_audio" in trace.marks else "no_audio")
+    request_seconds.observe(trace.end - trace.start)
+    if "first_audio" in trace.marks:
+        first_audio_seconds.observe(trace.marks["first_audio"] - trace.start)
+    for span in list(trace.spans):
+        if span.end:
+            stage_seconds.observe(span.end - span.start, stage=span.kind)
+
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    # A blocked event loop wakes this task up late; the delay is the lag every request sees as well
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - expected)
+        _loop_lag["last"] = lag
+        loop_lag_seconds.observe(lag)
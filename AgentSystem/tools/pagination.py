@@ -0,0 +1,77 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlsplit
+import google_auth_httplib2
+import httplib2
+from tools.metrics import record_google_request
+from tools.tracing import span
+
+# Shared pool that fetches the next page while the current one is consumed
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="page-prefetch")
+_local = threading.local()
+
+
+class TracedHttp(google_auth_httplib2.AuthorizedHttp):
+    # Every request on a worker thread is counted and becomes a span of the request trace that started the thread
+    def request(self, uri, method="GET", *args, **kwargs):
+        with span(f"{method} {urlsplit(uri).path}", "google", host=urlsplit(uri).netloc) as current:
+            try:
+                response, content = super().request(uri, method, *args, **kwargs)
+            except Exception:
+                record_google_request(uri, None)
+                raise
+            record_google_request(uri, response.status)
+            if current:
+                current.attributes["status"] = response.status
+            return response, content
+
+
+def thread_http(service) -> google_auth_httplib2.AuthorizedHttp:
+    """
+    httplib2 connections must not be shared between threads, so every thread executes requests
+    through its own authorized Http (request.execute(http=...)), built from the service's credentials.
+    """
+    credentials = service._http.credentials
+    cache = getattr(_local, "http", None)
+    if cache is None:
+        cache = _local.http = {}
+    http = cache.get(id(credentials))
+    if http is None:
+        http = cache[id(credentials)] = TracedHttp(credentials, http=httplib2.Http())
+    return http
+
+
+class Paginator:
+    """
+    Lazily yields the items of a paginated Google list call across all pages.
+    fetch_page(page_token) returns one response page; as soon as a page arrives the next one is
+    requested in the background, and a caller that stops iterating early never pays for the rest.
+    last_page holds the final response, e.g. for its nextSyncToken.
+    """
+
+    def __init__(self, fetch_page: Callable[[Optional[str]], dict], items_key: str = "items", prefetch: bool = True):
+        self.fetch_page = fetch_page
+        self.items_key = items_key
+        self.prefetch = prefetch
+        self.last_page: Optional[dict] = None
+
+    def __iter__(self) -> Iterator[dict]:
+        page = self.fetch_page(None)
+        while True:
+            next_token = page.get("nextPageToken")
+            # The copied context keeps the prefetch in the caller's trace
+            upcoming = _prefetch_pool.submit(contextvars.copy_context().run, self.fetch_page, next_token) if self.prefetch and next_token else None
+            try:
+                for item in page.get(self.items_key, []):
+                    yield item
+            except GeneratorExit:
+                # Stopped early: do not fetch a page nobody reads
+                if upcoming:
+                    upcoming.cancel()
+                raise
+            if not next_token:
+                self.last_page = page
+                return
+            page = upcoming.result() if upcoming else self.fetch_page(next_token)
@@ -0,0 +1,164 @@
+"""
+WebSocket protocol v1
+
+A client opts in by sending {"type": "hello", "version": 1} as its first frame; clients that start
+with raw audio keep the legacy Base64 behaviour. To resume a conversation after a reconnect, the hello
+carries the session_token of the previous connection (legacy clients: ?session_token= query parameter).
+
+Client → server:
+  {"type": "hello", "version", "session_token"?}
+  binary                             audio (one complete utterance on /ws, LINEAR16 chunks on /ws/stream)
+  {"type": "start", "sample_rate"}   /ws/stream: a new utterance begins
+  {"type": "end"}                    /ws/stream: the client stopped recording
+
+Server → client:
+  {"type": "hello", "version", "session_id", "session_token", "resumed"}
+  {"type": "status", "turn", "state"}              processing | done
+  {"type": "transcript", "turn", "text"}
+  binary                                           audio segment, see AUDIO_HEADER
+  {"type": "audio_end", "turn", "segments"}
+  {"type": "timing", "turn", ...durations in ms}
+  {"type": "error", "turn", "code", "message"}      no_speech | processing_failed | bad_request
+"""
+import base64
+import json
+import struct
+from typing import Optional
+
+PROTOCOL_VERSION = 1
+
+# Sample rates speech recognition accepts for LINEAR16 audio
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+# Binary audio frame: protocol version, turn number, segment sequence number, followed by the MP3 bytes
+AUDIO_HEADER = struct.Struct("!BII")
+
+# Stage durations reported in the timing frame: name → (start timestamp, end timestamp)
+TIMING_STAGES = {
+    "stt_ms": ("stt_start", "stt_end"),
+    "agent_first_token_ms": ("agent_start", "agent_first_token"),
+    "agent_ms": ("agent_start", "agent_end"),
+    "tts_ms": ("tts_start", "tts_end"),
+    "first_audio_ms": ("start", "first_audio"),
+    "total_ms": ("start", "end"),
+}
+
+
+def encode_audio_frame(turn: int, seq: int, audio: bytes) -> bytes:
+    return AUDIO_HEADER.pack(PROTOCOL_VERSION, turn, seq) + audio
+
+
+def decode_audio_frame(frame: bytes) -> tuple[int, int, memoryview]:
+    # Returns turn, sequence number and the audio payload without copying it
+    view = memoryview(frame)
+    _version, turn, seq = AUDIO_HEADER.unpack_from(view)
+    return turn, seq, view[AUDIO_HEADER.size:]
+
+
+def control_message(message_type: str, **fields) -> str:
+    return json.dumps({"type": message_type, **fields})
+
+
+def parse_control_message(text: str) -> Optional[dict]:
+    # JSON control frame or None for anything else (e.g. legacy plain-text commands)
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(message, dict) and "type" in message:
+        return message
+    return None
+
+
+def parse_sample_rate(value) -> Optional[int]:
+    # Sample rate from a query parameter or a start message, None for anything recognition would reject
+    try:
+        sample_rate = int(value)
+    except (TypeError, ValueError):
+        return None
+    return sample_rate if MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE else None
+
+
+def timing_fields(timestamps: dict) -> dict:
+    return {
+        name: round((timestamps[end] - timestamps[start]) * 1000)
+        for name, (start, end) in TIMING_STAGES.items()
+        if start in timestamps and end in timestamps
+    }
+
+
+class ProtocolChannel:
+    """Sends replies with protocol v1: binary audio segments and JSON control frames."""
+    version = PROTOCOL_VERSION
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    async def send_hello(self, session_id: str, session_token: str, resumed: bool = False):
+        await self.websocket.send_text(control_message("hello", version=self.version, session_id=session_id,
+                                                       session_token=session_token, resumed=resumed))
+
+    async def send_status(self, turn: int, state: str):
+        await self.websocket.send_text(control_message("status", turn=turn, state=state))
+
+    async def send_transcript(self, turn: int, text: str):
+        await self.websocket.send_text(control_message("transcript", turn=turn, text=text))
+
+    async def send_audio(self, turn: int, seq: int, audio: bytes):
+        await self.websocket.send_bytes(encode_audio_frame(turn, seq, audio))
+
+    async def send_audio_end(self, turn: int, segments: int):
+        await self.websocket.send_text(control_message("audio_end", turn=turn, segments=segments))
+
+    async def send_timing(self, turn: int, timestamps: dict):
+        await self.websocket.send_text(control_message("timing", turn=turn, **timing_fields(timestamps)))
+
+    async def send_error(self, turn: int, code: str, message: str):
+        await self.websocket.send_text(control_message("error", turn=turn, code=code, message=message))
+
+
+class LegacyChannel:
+    """
+    Pre-protocol behaviour for clients that never sent a hello: Base64 text frames and magic error strings.
+    With joined=True the whole reply goes out as one frame (/ws), otherwise one frame per segment
+    followed by "[End of response]" (/ws/stream).
+    """
+    version = 0
+
+    def __init__(self, websocket, joined: bool):
+        self.websocket = websocket
+        self.joined = joined
+        self.pending = []
+
+    async def send_hello(self, session_id: str, session_token: str, resumed: bool = False):
+        pass
+
+    async def send_status(self, turn: int, state: str):
+        pass
+
+    async def send_transcript(self, turn: int, text: str):
+        pass
+
+    async def send_audio(self, turn: int, seq: int, audio: bytes):
+        if self.joined:
+            self.pending.append(audio)
+        else:
+            await self.websocket.send_text(base64.b64encode(audio).decode("utf-8"))
+
+    async def send_audio_end(self, turn: int, segments: int):
+        if self.joined:
+            audio, self.pending = b"".join(self.pending), []
+            await self.websocket.send_text(base64.b64encode(audio).decode("utf-8"))
+        else:
+            await self.websocket.send_text("[End of response]")
+
+    async def send_timing(self, turn: int, timestamps: dict):
+        pass
+
+    async def send_error(self, turn: int, code: str, message: str):
+        self.pending = []
+        if code == "no_speech":
+            await self.websocket.send_text("[No speech detected]")
+        else:
+            await self.websocket.send_text("[Error during processing]")
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, NamedTuple, Optional
+from tools.intent_router import cosine, ngram_vector
+from tools.title_index import tokenize
+
+# Read-only tools and the data they answer from; an answer that used any other tool is never cached.
+# get_current_time is left out on purpose: its answer goes stale without any data version changing.
+READ_ONLY_TOOLS: Dict[str, str] = {
+    "list_events": "calendar",
+    "check_availability": "calendar",
+    "find_free_slot": "calendar",
+    "list_todos": "tasks",
+    "list_todos_in_list": "tasks",
+    "list_due_todos": "tasks",
+    "search_todos": "tasks",
+    "list_tasklists": "tasks",
+}
+
+RESPONSE_CACHE_ENABLED = os.getenv("LYRA_RESPONSE_CACHE", "1") != "0"
+# Relative phrasing ("was steht heute noch an") goes stale even without data changes
+RESPONSE_CACHE_TTL = float(os.getenv("LYRA_RESPONSE_CACHE_TTL", "900"))
+# Minimum n-gram similarity for a differently worded question to reuse an answer
+SIMILARITY_THRESHOLD = 0.8
+MAX_ENTRIES = 256
+
+# Utterances with these word stems change data, they are never answered from the cache
+MUTATING_STEMS = (
+    "losch", "entfern", "erstell", "trag", "eintrag", "schreib", "setz", "fug", "verschieb", "verleg", "ander", "markier", "hak",
+    "abhak", "erledig", "add", "delete", "remov", "creat", "cancel", "move", "mark", "chang", "updat", "renam",
+)
+# Words that pick the day or time; a similar question with different ones is a different question
+TIME_WORDS = {
+    "heute", "morgen", "ubermorgen", "gestern", "woche", "wochenende", "today", "tomorrow", "yesterday", "week", "weekend",
+    "montag", "dienstag", "mittwoch", "donnerstag", "freitag", "samstag", "sonntag",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+
+class CachedResponse(NamedTuple):
+    text: str
+    intent: Optional[str]  # Specialist that produced the answer
+    day: date
+    versions: Dict[str, int]  # data source → version the answer was computed from
+    vector: Dict[int, float]
+    created_at: float
+
+
+class ResponseCache:
+    """
+    Answers of read-only assistant turns, keyed by the normalized transcript.
+    A lookup reuses an answer for the same or a very similar question (character n-gram cosine)
+    asked on the same day, as long as the calendar/task data it was computed from is unchanged:
+    every entry keeps the version of each source it read, and any write bumps that version.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(tokenize(text))
+
+    @staticmethod
+    def cacheable_sources(tool_names: Iterable[str]) -> Optional[set]:
+        # Data sources the answer depends on, or None when it must not be cached
+        tool_names = list(tool_names)
+        if not tool_names or any(name not in READ_ONLY_TOOLS for name in tool_names):
+            return None
+        return {READ_ONLY_TOOLS[name] for name in tool_names}
+
+    @staticmethod
+    def is_mutating(text: str) -> bool:
+        return any(token.startswith(MUTATING_STEMS) for token in tokenize(text))
+
+    @staticmethod
+    def _anchors(key: str) -> set:
+        # Day words and numbers must match exactly, only the wording around them may differ
+        return {token for token in key.split() if token in TIME_WORDS or token.isdigit()}
+
+    def get(self, text: str, day: date, versions: Dict[str, int]) -> Optional[CachedResponse]:
+        if self.is_mutating(text):
+            return None
+        key = self.normalize(text)
+        anchors = self._anchors(key)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not self._valid(entry, day, versions, now):
+                vector = ngram_vector(key)
+                entry = None
+                best = self.threshold
+                for candidate_key, candidate in self.entries.items():
+                    if not self._valid(candidate, day, versions, now) or self._anchors(candidate_key) != anchors:
+                        continue
+                    similarity = cosine(vector, candidate.vector)
+                    if similarity >= best:
+                        key, entry, best = candidate_key, candidate, similarity
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, text: str, response: str, intent: Optional[str], day: date, versions: Dict[str, int]):
+        if self.is_mutating(text):
+            return
+        key = self.normalize(text)
+        with self.lock:
+            self.entries[key] = CachedResponse(response, intent, day, versions, ngram_vector(key), time.time())
+            self.entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _valid(self, entry: CachedResponse, day: date, versions: Dict[str, int], now: float) -> bool:
+        return (entry.day == day and now - entry.created_at < self.ttl
+                and all(versions.get(source) == version for source, version in entry.versions.items()))
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, Optional
+from tools.context_manager import ContextManager
+from tools.session_store import SessionStore
+from tools.tracing import Trace
+
+
+class Session:
+    """
+    State that belongs to exactly one client connection.
+    Expensive clients (STT/TTS, Google services, agents) stay shared in HandoffAgentSystem.
+    """
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        # Key of the durable state; a reconnecting client sends it again to resume the conversation
+        self.token = self.session_id
+        self.context_manager = ContextManager()
+        # Spans of the request currently or last answered
+        self.trace: Optional[Trace] = None
+        # Specialist that answered the last turn, the router prefers it for follow-ups
+        self.last_intent: Optional[str] = None
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        # One turn at a time per session, different sessions run in parallel
+        self.lock = asyncio.Lock()
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def to_dict(self) -> dict:
+        return {"context": self.context_manager.to_dict(), "last_intent": self.last_intent}
+
+    def restore(self, state: dict):
+        self.context_manager = ContextManager.from_dict(state.get("context", {}))
+        self.last_intent = state.get("last_intent")
+
+
+class SessionManager:
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.sessions: Dict[str, Session] = {}
+        # Without a store sessions only live as long as their connection
+        self.store = store
+
+    def open(self, session_id: Optional[str] = None) -> Session:
+        # Create a new session and register it
+        session = Session(session_id)
+        self.sessions[session.session_id] = session
+        return session
+
+    async def resume(self, session: Session, token: Optional[str]) -> bool:
+        # Adopt the client's token and load the state stored under it, if any
+        if not token or not self.store:
+            return False
+        session.token = token
+        state = await self.store.async_load(token)
+        if state is None:
+            return False
+        session.restore(state)
+        print(f"♻️ Session fortgesetzt (session {session.session_id})")
+        return True
+
+    def save(self, session: Session):
+        # Queued, the store writes it with its next batch
+        if self.store:
+            self.store.save(session.token, session.to_dict())
+
+    def close(self, session_id: str):
+        # Forget the session once its connection is gone; the store keeps its state for a reconnect
+        session = self.sessions.pop(session_id, None)
+        if session and (session.context_manager.context or session.context_manager.summary):
+            self.save(session)
+
+    @property
+    def active_count(self) -> int:
+        return len(self.sessions)
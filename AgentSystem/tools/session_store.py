@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+SESSION_STORE_ENABLED = os.getenv("LYRA_SESSION_STORE", "1") != "0"
+SESSION_DB_PATH = os.getenv("LYRA_SESSION_DB", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions.db"))
+# Sessions untouched for this long are deleted, a reconnect afterwards starts fresh
+SESSION_TTL = float(os.getenv("LYRA_SESSION_TTL", str(7 * 24 * 3600)))
+# Seconds between two batched writes
+FLUSH_INTERVAL = float(os.getenv("LYRA_SESSION_FLUSH_INTERVAL", "2"))
+# Expired sessions are deleted at most this often
+EXPIRE_INTERVAL = 3600
+
+
+class SessionStore:
+    """
+    Durable copy of the session state (context, last intent), keyed by the client's session token.
+    SQLite in WAL mode: loading a session on reconnect is one primary-key read, and saves are only
+    queued in memory and written in batches by a background task, one transaction per flush.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.pending: Dict[str, str] = {}  # token → serialized state, the latest save wins
+        self.lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._expired_at = 0.0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Opened on first use, shared by the worker threads under self.lock
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (token TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    ### Reads ###
+    def load(self, token: str) -> Optional[dict]:
+        with self.lock:
+            # A save that was not flushed yet is newer than the row
+            data = self.pending.get(token)
+            if data is None:
+                row = self.connection.execute(
+                    "SELECT data FROM sessions WHERE token = ? AND updated_at >= ?", (token, time.time() - self.ttl)
+                ).fetchone()
+                data = row[0] if row else None
+        return json.loads(data) if data else None
+
+    async def async_load(self, token: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.load, token)
+
+    ### Writes ###
+    def save(self, token: str, state: dict):
+        # Only queues the state; the flusher writes it with the next batch
+        with self.lock:
+            self.pending[token] = json.dumps(state, ensure_ascii=False)
+        self._start_flusher()
+
+    def _start_flusher(self):
+        if self._flusher and not self._flusher.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # Ohne Event-Loop sofort schreiben
+            return
+        self._flusher = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print("⚠️ Sessions konnten nicht gespeichert werden:", str(e))
+            if not self.pending:
+                return  # Restarted by the next save
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            if not batch:
+                return
+            now = time.time()
+            try:
+                with self.connection:
+                    self.connection.executemany(
+                        "INSERT INTO sessions (token, data, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(token) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        [(token, data, now) for token, data in batch.items()]
+                    )
+                    if now - self._expired_at > EXPIRE_INTERVAL:
+                        self.connection.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+                        self._expired_at = now
+            except Exception:
+                # Keep the batch for the next attempt, unless a newer save replaced it meanwhile
+                self.pending = {**batch, **self.pending}
+                raise
+
+    async def close(self):
+        # Write what is still queued, e.g. on server shutdown
+        if self._flusher:
+            self._flusher.cancel()
+        await asyncio.to_thread(self.flush)
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
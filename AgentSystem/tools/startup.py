@@ -0,0 +1,43 @@
+import importlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Tuple
+
+# Warm up the cloud clients and local mirrors once the server accepts connections ("0" turns it off)
+WARMUP_ENABLED = os.getenv("LYRA_WARMUP", "1") != "0"
+
+
+class StartupReport:
+    """
+    Collects how long each startup step took: module imports, object construction and the
+    warm-up that runs after the server is already accepting connections.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str, float]] = []  # (phase, step, seconds)
+        self.started_at = time.perf_counter()
+
+    @contextmanager
+    def measure(self, phase: str, step: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.entries.append((phase, step, time.perf_counter() - start))
+
+    def import_modules(self, modules: Iterable[str]):
+        # Listed in dependency order, so every entry only counts what that module adds
+        for module in modules:
+            with self.measure("import", module):
+                importlib.import_module(module)
+
+    def print(self, phase: str = None):
+        entries = [entry for entry in self.entries if phase is None or entry[0] == phase]
+        print("🚀 Startup-Report" + (f" ({phase})" if phase else "") + ":")
+        for entry_phase, step, seconds in entries:
+            print(f"   {entry_phase:<7} {step:<34} {seconds * 1000:8.1f} ms")
+        print(f"   {'total':<7} {'':<34} {sum(entry[2] for entry in entries) * 1000:8.1f} ms")
+
+
+startup_report = StartupReport()
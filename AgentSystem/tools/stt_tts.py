@@ -1,19 +1,103 @@
 from tools.authentication import Authenticator
+from tools.tts_cache import TTSCache
+from tools.metrics import stt_bytes_total, tts_bytes_total
 from google.cloud import texttospeech, speech
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+import asyncio
+import contextvars
 import io
 import os
+import queue
+import time
+import uuid
+
+# Default limits for parallel cloud calls, overridable per Converter or via environment
+MAX_CONCURRENT_TTS = int(os.getenv("LYRA_MAX_CONCURRENT_TTS", "8"))
+MAX_CONCURRENT_STT = int(os.getenv("LYRA_MAX_CONCURRENT_STT", "8"))
+# Optional directory that archives every recognized and synthesized clip; off on the hot path by default
+DEBUG_AUDIO_DIR = os.getenv("LYRA_DEBUG_AUDIO_DIR")
+# Cache synthesized phrases across requests and restarts (see tools/tts_cache.py)
+TTS_CACHE_ENABLED = os.getenv("LYRA_TTS_CACHE", "1") != "0"
+
+# Audio accepted by speech_to_text: raw bytes, a memoryview of them, or a file path
+AudioInput = Union[bytes, bytearray, memoryview, str]
 
 class Converter:
-    def __init__(self):
-        self.tts_client = Authenticator.authenticate("tts")
-        self.stt_client = Authenticator.authenticate("stt")
+    def __init__(self, max_concurrent_tts: int = MAX_CONCURRENT_TTS, max_concurrent_stt: int = MAX_CONCURRENT_STT,
+                 debug_audio_dir: Optional[str] = DEBUG_AUDIO_DIR, use_tts_cache: bool = TTS_CACHE_ENABLED):
+        # The cloud clients are created on first use (or during the server warm-up), not at import time
+        self._tts_client = None
+        self._stt_client = None
 
-        if not self.tts_client:
-            print("⚠️ TTS-Authentifizierung fehlgeschlagen.")
-        if not self.stt_client:
-            print("⚠️ STT-Authentifizierung fehlgeschlagen.")
+        # The gRPC clients are blocking; run them in a bounded pool off the event loop.
+        # Separate semaphores keep a burst of syntheses from starving recognition and vice versa.
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_tts + max_concurrent_stt,
+            thread_name_prefix="converter"
+        )
+        self.tts_semaphore = asyncio.Semaphore(max_concurrent_tts)
+        self.stt_semaphore = asyncio.Semaphore(max_concurrent_stt)
+
+        self.debug_audio_dir = debug_audio_dir
+        if debug_audio_dir:
+            os.makedirs(debug_audio_dir, exist_ok=True)
+
+        self.tts_cache = TTSCache() if use_tts_cache else None
+
+    async def async_text_to_speech(self, text: str, output_file: Optional[str] = None, voice_name="de-DE-Chirp3-HD-Charon"):
+        # Same as text_to_speech, but awaits a free TTS slot and runs the call in the pool.
+        # Phrases already in the memory cache skip the queue entirely.
+        if self.tts_cache and not output_file:
+            audio = self.tts_cache.peek(TTSCache.make_key(text, voice_name, "mp3"))
+            if audio is not None:
+                tts_bytes_total.inc(len(audio))
+                return audio
+        async with self.tts_semaphore:
+            loop = asyncio.get_running_loop()
+            # run_in_executor does not copy the context itself, the trace has to be passed along
+            audio = await loop.run_in_executor(self.executor, contextvars.copy_context().run, self.text_to_speech, text, output_file, voice_name)
+        if isinstance(audio, (bytes, bytearray)):
+            tts_bytes_total.inc(len(audio))
+        return audio
+
+    async def async_speech_to_text(self, audio: AudioInput, sample_rate: int = 16000):
+        # Same as speech_to_text, but awaits a free STT slot and runs the call in the pool
+        if not isinstance(audio, str):
+            stt_bytes_total.inc(audio.nbytes if isinstance(audio, memoryview) else len(audio))
+        async with self.stt_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, contextvars.copy_context().run, self.speech_to_text, audio, sample_rate)
+
+    @property
+    def tts_client(self):
+        if self._tts_client is None:
+            self._tts_client = Authenticator.authenticate("tts")
+            if not self._tts_client:
+                print("⚠️ TTS-Authentifizierung fehlgeschlagen.")
+        return self._tts_client
+
+    @property
+    def stt_client(self):
+        if self._stt_client is None:
+            self._stt_client = Authenticator.authenticate("stt")
+            if not self._stt_client:
+                print("⚠️ STT-Authentifizierung fehlgeschlagen.")
+        return self._stt_client
+
+    def start_speech_stream(self, sample_rate: int = 16000, language_code: str = "de-DE") -> "SpeechStream":
+        # Open a streaming recognition that audio chunks can be fed into while the user is still talking
+        return SpeechStream(self, sample_rate, language_code)
+
+    def text_to_speech(self, text: str, output_file: Optional[str] = None, voice_name="de-DE-Chirp3-HD-Charon"): # Alternative de-DE-Wavenet-H for female oder  de-DE-Studio-C
+        cache_key = TTSCache.make_key(text, voice_name, "mp3")
+        if self.tts_cache:
+            audio = self.tts_cache.get(cache_key)
+            if audio is not None:
+                if output_file:
+                    self._write_audio(output_file, audio)
+                return audio
 
-    def text_to_speech(self, text: str, output_file: str = "output.mp3", voice_name="de-DE-Chirp3-HD-Charon"): # Alternative de-DE-Wavenet-H for female oder  de-DE-Studio-C
         if not self.tts_client:
             return
 
@@ -36,24 +120,34 @@ class Converter:
                 audio_config=audio_config
             )
 
-            with open(output_file, "wb") as out:
-                out.write(response.audio_content)
+            if self.tts_cache and response.audio_content:
+                self.tts_cache.put(cache_key, response.audio_content)
+
+            # The MP3 bytes stay in memory; files are only written on request or in debug mode
+            if output_file:
+                self._write_audio(output_file, response.audio_content)
                 print(f"✅ TTS: Audio gespeichert als: {output_file}")
-            return response.audio_content  # <== hier: Bytes zurückgeben!^
+            self._archive("tts", ".mp3", response.audio_content)
+            return response.audio_content
         except Exception as e:
             print("❌ TTS-Fehler:", str(e))
             return None
 
-    def speech_to_text(self, audio_file: str, sample_rate: int = 16000):
+    def speech_to_text(self, audio: AudioInput, sample_rate: int = 16000):
         if not self.stt_client:
             return
 
-        if not os.path.exists(audio_file):
-            print(f"❌ Datei nicht gefunden: {audio_file}")
-            return
-
-        with io.open(audio_file, "rb") as audio:
-            content = audio.read()
+        # A path is only used by the command line helpers; the server passes the received bytes directly
+        if isinstance(audio, str):
+            if not os.path.exists(audio):
+                print(f"❌ Datei nicht gefunden: {audio}")
+                return
+            with io.open(audio, "rb") as audio_file:
+                content = audio_file.read()
+        else:
+            # protobuf needs real bytes, so a memoryview is copied exactly once here
+            content = audio if isinstance(audio, bytes) else bytes(audio)
+        self._archive("stt", ".wav", content)
 
         audio = speech.RecognitionAudio(content=content)
 
@@ -77,11 +171,108 @@ class Converter:
             print("❌ STT-Fehler:", str(e))
             return None
 
+    def _archive(self, kind: str, suffix: str, content: bytes):
+        # Debug/archival mode: keep a copy of every clip under a unique name
+        if self.debug_audio_dir:
+            self._write_audio(os.path.join(self.debug_audio_dir, f"{kind}_{int(time.time())}_{uuid.uuid4().hex[:8]}{suffix}"), content)
+
+    @staticmethod
+    def _write_audio(path: str, content: bytes):
+        try:
+            with open(path, "wb") as out:
+                out.write(content)
+        except OSError as e:
+            print(f"⚠️ Audio konnte nicht gespeichert werden ({path}):", str(e))
+
+class SpeechStream:
+    """
+    One streaming recognition for a single utterance.
+    Chunks are fed from the event loop, streaming_recognize runs in the converter pool
+    and the server's end-of-utterance event finishes the stream without waiting for the client.
+    """
+    # streaming_recognize rejects requests with more than 25 KB of audio
+    MAX_CHUNK_BYTES = 16000
+
+    def __init__(self, converter: Converter, sample_rate: int = 16000, language_code: str = "de-DE"):
+        self.converter = converter
+        self.sample_rate = sample_rate
+        self.language_code = language_code
+        self.started_at = time.time()
+        self.closed = False
+        self._chunks = queue.Queue()
+        self._task = asyncio.ensure_future(self._run())
+
+    def feed(self, chunk: bytes):
+        # Forward a chunk of LINEAR16 audio; ignored once the utterance has ended
+        if not self.closed:
+            stt_bytes_total.inc(len(chunk))
+            self._chunks.put(chunk)
+
+    def finish(self):
+        # The client stopped recording
+        self._close()
+
+    async def transcript(self):
+        # Final transcript of the utterance (None on error)
+        return await self._task
+
+    def _close(self):
+        if not self.closed:
+            self.closed = True
+            self._chunks.put(None)
+
+    async def _run(self):
+        async with self.converter.stt_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.converter.executor, contextvars.copy_context().run, self._recognize)
+
+    def _requests(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            for offset in range(0, len(chunk), self.MAX_CHUNK_BYTES):
+                yield speech.StreamingRecognizeRequest(audio_content=chunk[offset:offset + self.MAX_CHUNK_BYTES])
+
+    def _recognize(self):
+        if not self.converter.stt_client:
+            self._close()
+            return None
+
+        config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code=self.language_code
+            ),
+            single_utterance=True  # Google detects the end of speech for us
+        )
+
+        transcript = []
+        try:
+            responses = self.converter.stt_client.streaming_recognize(config=config, requests=self._requests())
+            for response in responses:
+                if response.speech_event_type == speech.StreamingRecognizeResponse.SpeechEventType.END_OF_SINGLE_UTTERANCE:
+                    # Stop sending audio, the final result follows in the next responses
+                    self._close()
+                for result in response.results:
+                    if result.is_final:
+                        transcript.append(result.alternatives[0].transcript.strip())
+        except Exception as e:
+            print("❌ STT-Stream-Fehler:", str(e))
+            return None
+        finally:
+            self._close()
+
+        text = " ".join(part for part in transcript if part)
+        print("📝 Transkription (Stream):", text)
+        return text
+
 if __name__ == "__main__":
     converter = Converter()
 
     # Text → Sprache
-    converter.text_to_speech("Dies ist ein kurzer Test der Google Sprachsynthese.")
+    converter.text_to_speech("Dies ist ein kurzer Test der Google Sprachsynthese.", output_file="output.mp3")
 
     # Sprache → Text
     converter.speech_to_text("test_audio.wav")
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+
+def to_rfc3339(moment: datetime) -> str:
+    # Same format as the "updated" field Google sends, so both compare as strings
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def now_rfc3339() -> str:
+    return to_rfc3339(datetime.now(timezone.utc))
+
+
+def is_newer(item: dict, other: Optional[dict]) -> bool:
+    # Last write wins, by the "updated" time Google stamps on every change
+    return other is None or item.get("updated", "") >= other.get("updated", "")
+
+
+class SyncedStore:
+    """
+    Base of the local copies of Google data (calendar events, tasks).
+    A background thread syncs every sync_interval seconds with its own service object, as httplib2
+    connections are not thread-safe. Local writes are applied at once; local deletes leave a tombstone,
+    so a sync page fetched before the delete cannot bring the item back.
+    Subclasses implement sync(service).
+    """
+
+    # Thread name and the name in the log message of a failed sync
+    thread_name = "sync"
+    sync_label = "Sync"
+
+    def __init__(self, service_factory: Callable, sync_interval: float):
+        self.service_factory = service_factory
+        self.sync_interval = sync_interval
+        self.deleted: Dict[str, str] = {}  # item ID → local deletion time, guards against stale sync pages
+        self.synced_at: Optional[float] = None
+        # Bumped on every change, lets caches of derived answers detect stale data
+        self.version = 0
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        # Initial sync and periodic refresh, both off the request path
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        service = self.service_factory()
+        while True:
+            try:
+                self.sync(service)
+            except Exception as e:
+                print(f"⚠️ {self.sync_label}-Sync fehlgeschlagen:", str(e))
+            if self._stop.wait(self.sync_interval):
+                return
+
+    def sync(self, service):
+        raise NotImplementedError
+
+    def _merge_local(self, snapshot: Dict[str, dict], local: Dict[str, dict], sync_started: str):
+        # Local writes and deletes that happened during a full load win over its snapshot; call with the lock held
+        for item_id, item in local.items():
+            if item.get("updated", "") >= sync_started and is_newer(item, snapshot.get(item_id)):
+                snapshot[item_id] = item
+        for item_id, deleted_at in self.deleted.items():
+            if item_id in snapshot and snapshot[item_id].get("updated", "") <= deleted_at:
+                snapshot.pop(item_id)
+
+    def _deleted_locally(self, item: dict) -> bool:
+        # A change from Google that is older than a local delete of the same item
+        return item.get("updated", "") <= self.deleted.get(item["id"], "")
+
+    def _forget_tombstones_before(self, synced_since: str):
+        # A sync that started after a local delete already reflects it
+        self.deleted = {item_id: deleted_at for item_id, deleted_at in self.deleted.items() if deleted_at >= synced_since}
@@ -0,0 +1,149 @@
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# A match needs at least this score to be acted on
+MIN_SCORE = 0.45
+# The best match must lead the runner-up by this much, otherwise the lookup is ambiguous
+AMBIGUITY_MARGIN = 0.15
+# Simple plural endings (English "s", German "en"/"e")
+PLURAL_ENDINGS = ("en", "e", "s")
+
+
+def normalize_title(text: str) -> str:
+    # Case- and accent-insensitive form, "Straße" and "strasse" compare equal
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", normalize_title(text))
+
+
+def is_plural_of(token: str, other: str) -> bool:
+    # "sessions" of "session", "termine" of "termin"; only a whole word plus an ending, so "ross" is no form of "rose"
+    return any(token == other + ending for ending in PLURAL_ENDINGS)
+
+
+def trigrams(tokens: Iterable[str]) -> Set[str]:
+    # Word-padded trigrams, so word starts and ends carry weight
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    """
+    Fuzzy lookup of events and tasks by title.
+    Trigram postings find candidates; the score blends token matches (exact or plural token > prefix > substring)
+    with trigram similarity, so "Arzt" ranks "Arzt Kontrolle" well above "Zahnarzt".
+    """
+
+    def __init__(self):
+        self.titles: Dict[Hashable, str] = {}
+        self.tokens: Dict[Hashable, List[str]] = {}
+        self.grams: Dict[Hashable, Set[str]] = {}
+        self.postings: Dict[str, Set[Hashable]] = defaultdict(set)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[Hashable, str]]) -> "TitleIndex":
+        index = cls()
+        for key, title in items:
+            index.add(key, title)
+        return index
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, key: Hashable, title: str):
+        if self.titles.get(key) == title:
+            return
+        self.remove(key)
+        tokens = tokenize(title)
+        grams = trigrams(tokens)
+        self.titles[key] = title
+        self.tokens[key] = tokens
+        self.grams[key] = grams
+        for gram in grams:
+            self.postings[gram].add(key)
+
+    def remove(self, key: Hashable):
+        if key not in self.titles:
+            return
+        for gram in self.grams.pop(key):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+        del self.titles[key]
+        del self.tokens[key]
+
+    def clear(self):
+        self.titles.clear()
+        self.tokens.clear()
+        self.grams.clear()
+        self.postings.clear()
+
+    def search(self, query: str, keys: Optional[Iterable[Hashable]] = None, limit: int = 5) -> List[Tuple[Hashable, float]]:
+        """
+        Ranked (key, score) candidates for the query, best first; scores are between 0 and 1.
+        `keys` restricts the search, e.g. to the events of a time window.
+        """
+        query_tokens = tokenize(query)
+        query_grams = trigrams(query_tokens)
+        if not query_tokens:
+            return []
+
+        if keys is not None:
+            candidates = [key for key in keys if key in self.titles]
+        else:
+            candidates = set()
+            for gram in query_grams:
+                candidates.update(self.postings.get(gram, ()))
+
+        scored = []
+        for key in candidates:
+            score = self._score(query_tokens, query_grams, key)
+            if score > 0:
+                scored.append((key, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def _score(self, query_tokens: List[str], query_grams: Set[str], key: Hashable) -> float:
+        title_tokens = self.tokens[key]
+        token_score = 0.0
+        for query_token in query_tokens:
+            best = 0.0
+            for title_token in title_tokens:
+                if title_token == query_token or is_plural_of(title_token, query_token) or is_plural_of(query_token, title_token):
+                    best = 1.0
+                    break
+                if title_token.startswith(query_token):
+                    best = max(best, 0.8)
+                elif query_token in title_token:
+                    best = max(best, 0.5)
+            token_score += best
+        token_score /= len(query_tokens)
+
+        title_grams = self.grams[key]
+        if not title_grams:
+            return 0.0
+        dice = 2 * len(query_grams & title_grams) / (len(query_grams) + len(title_grams))
+        return round(0.6 * token_score + 0.4 * dice, 3)
+
+
+def pick_match(ranked: List[Tuple[Hashable, float]], min_score: float = MIN_SCORE,
+               margin: float = AMBIGUITY_MARGIN) -> Tuple[Optional[Hashable], List[Tuple[Hashable, float]]]:
+    """
+    Decide on a ranked search result: returns (key, candidates) for a clear winner,
+    (None, candidates) when several titles match about equally well, (None, []) for no match.
+    """
+    candidates = [(key, score) for key, score in ranked if score >= min_score]
+    if not candidates:
+        return None, []
+    if len(candidates) == 1 or candidates[0][1] - candidates[1][1] >= margin:
+        return candidates[0][0], candidates
+    return None, candidates
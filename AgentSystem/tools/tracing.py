@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from agents import add_trace_processor, get_current_span as get_current_agent_span
+from agents.tracing import TracingProcessor
+
+# Every finished request is appended here as one JSON line; off unless set
+TRACE_FILE = os.getenv("LYRA_TRACE_FILE")
+# Durations kept per span name for the percentiles
+HISTOGRAM_WINDOW = int(os.getenv("LYRA_TRACE_WINDOW", "1000"))
+PERCENTILES = (50, 95, 99)
+
+
+class Span:
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, kind: str, start: float, end: Optional[float] = None, span_id: Optional[str] = None,
+                 parent_id: Optional[str] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.kind = kind  # stt, llm, agent, handoff, tool, google, tts, ...
+        self.span_id = span_id or uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = start
+        self.end = end
+        self.attributes = attributes or {}
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "kind": self.kind, "span_id": self.span_id, "parent_id": self.parent_id,
+            "start": self.start, "duration_ms": round(self.duration_ms, 1), **({"attributes": self.attributes} if self.attributes else {}),
+        }
+
+
+class Trace:
+    """
+    All spans of one request (one utterance), plus marks for single moments like the first audio.
+    Spans may be added from worker threads and parallel tasks.
+    """
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.marks: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def mark(self, name: str, moment: Optional[float] = None):
+        # Only the first occurrence counts, e.g. the first token or the first audio segment
+        self.marks.setdefault(name, moment or time.time())
+
+    def add(self, name: str, kind: str, start: float, end: float, span_id: Optional[str] = None,
+            parent_id: Optional[str] = None, **attributes) -> Span:
+        span = Span(name, kind, start, end, span_id, parent_id, attributes)
+        self.append(span)
+        return span
+
+    def append(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+    def _bounds(self, kind: str):
+        spans = [span for span in self.spans if span.kind == kind and span.end]
+        if not spans:
+            return None
+        return min(span.start for span in spans), max(span.end for span in spans)
+
+    def timestamps(self) -> Dict[str, float]:
+        # Stage boundaries for the protocol timing frame; parallel TTS spans from first start to last end
+        timestamps = {"start": self.start}
+        for prefix, kind in (("stt", "stt"), ("agent", "agent_run"), ("tts", "tts")):
+            bounds = self._bounds(kind)
+            if bounds:
+                timestamps[f"{prefix}_start"], timestamps[f"{prefix}_end"] = bounds
+        timestamps.update(self.marks)
+        if self.end:
+            timestamps["end"] = self.end
+        return timestamps
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "session_id": self.session_id, "start": self.start,
+            "duration_ms": round(((self.end or time.time()) - self.start) * 1000, 1),
+            "marks": {name: round((moment - self.start) * 1000, 1) for name, moment in self.marks.items()},
+            "spans": [span.to_dict() for span in sorted(self.spans, key=lambda span: span.start)],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("lyra_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("lyra_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def activate(trace: Trace):
+    # Everything awaited inside, and every task or executor call started with the copied context, records into trace
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            pass  # Generator closed from another context, that context never saw the trace
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    Times the block as a span of the current trace; a no-op without one (e.g. background syncs).
+    Nested spans, also those of the Agents SDK (function tools), become the parent.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    if parent is not None:
+        parent_id = parent.span_id
+    else:
+        agent_span = get_current_agent_span()
+        parent_id = agent_span.span_id if agent_span is not None else None
+    current = Span(name, kind, time.time(), parent_id=parent_id, attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.end = time.time()
+        _current_span.reset(token)
+        trace.append(current)
+
+
+def _parse_iso(moment: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(moment).timestamp() if moment else None
+
+
+class AgentSpanRecorder(TracingProcessor):
+    """
+    Copies the spans of the Agents SDK (LLM responses, agents, handoffs, function tools) into the
+    trace of the request that ran them. The SDK calls this in the task of the run, so the request's
+    context is available.
+    """
+
+    def on_trace_start(self, trace):
+        pass
+
+    def on_trace_end(self, trace):
+        pass
+
+    def on_span_start(self, span):
+        pass
+
+    def on_span_end(self, span):
+        trace = _current_trace.get()
+        start, end = _parse_iso(span.started_at), _parse_iso(span.ended_at)
+        # Background work started by a request (e.g. context compaction) may end after it
+        if trace is None or trace.end or start is None:
+            return
+        data = span.span_data
+        attributes = {"error": span.error.get("message")} if span.error else {}
+        if data.type in ("response", "generation"):
+            name, kind = "llm", "llm"
+            model = getattr(getattr(data, "response", None), "model", None) or getattr(data, "model", None)
+            if model:
+                attributes["model"] = model
+        elif data.type == "function":
+            name, kind = data.name, "tool"
+        elif data.type == "handoff":
+            name, kind = f"{data.from_agent} → {data.to_agent}", "handoff"
+        elif data.type == "agent":
+            name, kind = data.name, "agent"
+        else:
+            return
+        trace.add(name, kind, start, end or time.time(), span.span_id, span.parent_id, **attributes)
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self):
+        pass
+
+
+class Tracer:
+    """
+    Starts and finishes request traces. Finished traces are written as JSON lines (LYRA_TRACE_FILE)
+    and their span durations kept per kind and name, for p50/p95/p99 over the last requests.
+    """
+
+    def __init__(self, export_path: Optional[str] = TRACE_FILE, window: int = HISTOGRAM_WINDOW):
+        self.export_path = export_path
+        self.durations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))  # "kind/name" → ms
+        self.lock = threading.Lock()
+        self._agents_installed = False
+
+    def install_agent_processor(self):
+        # Once per process, the SDK keeps its processors globally
+        if not self._agents_installed:
+            add_trace_processor(AgentSpanRecorder())
+            self._agents_installed = True
+
+    def start(self, session_id: Optional[str] = None) -> Trace:
+        return Trace(session_id)
+
+    def finish(self, trace: Trace):
+        trace.end = trace.end or time.time()
+        with self.lock:
+            self.durations["request/total"].append((trace.end - trace.start) * 1000)
+            if "first_audio" in trace.marks:
+                self.durations["request/first_audio"].append((trace.marks["first_audio"] - trace.start) * 1000)
+            for span in trace.spans:
+                if span.end:
+                    self.durations[f"{span.kind}/{span.name}"].append(span.duration_ms)
+                    if span.kind != span.name:
+                        self.durations[f"{span.kind}/*"].append(span.duration_ms)
+            if self.export_path:
+                with open(self.export_path, "a", encoding="utf-8") as export_file:
+                    export_file.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+
+    def percentiles(self) -> Dict[str, dict]:
+        # Latency histogram summary per span, in ms
+        with self.lock:
+            snapshot = {key: sorted(values) for key, values in self.durations.items() if values}
+        summary = {}
+        for key, values in sorted(snapshot.items()):
+            summary[key] = {"count": len(values), **{
+                f"p{p}": round(values[min(len(values) - 1, int(len(values) * p / 100))], 1) for p in PERCENTILES
+            }}
+        return summary
+
+    @staticmethod
+    def print_trace(trace: Trace):
+        # Span tree of one request with durations, replaces the old timing overview
+        print(f"\n⏱️ Trace {trace.trace_id[:8]} (session {trace.session_id}):")
+        spans = sorted(trace.spans, key=lambda span: span.start)
+        ids = {span.span_id: span for span in spans}
+
+        def depth(span: Span) -> int:
+            level = 0
+            while span.parent_id in ids and level < 10:
+                span, level = ids[span.parent_id], level + 1
+            return level
+
+        for span in spans:
+            label = "  " * depth(span) + f"{span.kind}: {span.name}"
+            print(f"   +{(span.start - trace.start) * 1000:7.0f} ms  {label:<50} {span.duration_ms:8.1f} ms")
+        for name, moment in trace.marks.items():
+            print(f"   {name:<20} → {(moment - trace.start) * 1000:.0f} ms")
+        print(f"\n🕒 Total Duration: {((trace.end or time.time()) - trace.start) * 1000:.0f} ms")
+
+
+# One tracer for the whole process
+tracer = Tracer()
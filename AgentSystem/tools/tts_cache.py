@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+# Defaults, overridable per cache or via environment
+TTS_CACHE_DIR = os.getenv("LYRA_TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tts_cache"))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("LYRA_TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("LYRA_TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+
+def normalize_text(text: str) -> str:
+    # Same spoken output → same key: unicode form and whitespace do not change the audio
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TTSCache:
+    """
+    Content-addressed cache for synthesized audio.
+    Key: hash of normalized text, voice and audio format. An in-memory LRU sits in front of an
+    on-disk layer that survives restarts; both layers evict by size. Thread-safe, as the
+    converter synthesizes from a thread pool.
+    """
+
+    def __init__(self, directory: Optional[str] = TTS_CACHE_DIR,
+                 max_memory_bytes: int = TTS_CACHE_MEMORY_BYTES, max_disk_bytes: int = TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    @staticmethod
+    def make_key(text: str, voice: str, audio_format: str) -> str:
+        payload = "\x00".join([normalize_text(text), voice, audio_format])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def peek(self, key: str) -> Optional[bytes]:
+        # Memory layer only; cheap enough to call on the event loop
+        with self.lock:
+            audio = self.memory.get(key)
+            if audio is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return audio
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            audio = self.memory.get(key)
+            if audio is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return audio
+
+        audio = self._read_disk(key)
+        with self.lock:
+            if audio is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, audio)
+            return audio
+
+    def put(self, key: str, audio: bytes):
+        with self.lock:
+            self._remember(key, audio)
+        self._write_disk(key, audio)
+
+    def hit_ratio(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _remember(self, key: str, audio: bytes):
+        # Insert into the memory LRU and evict the least recently used entries above the size limit
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+        self.memory[key] = audio
+        self.memory_bytes += len(audio)
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            # Refresh the modification time so disk eviction is least-recently-used as well
+            os.utime(self._path(key))
+            return audio
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, audio: bytes):
+        if not self.directory:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        try:
+            # Write under a temporary name first so readers never see a partial file
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print("⚠️ TTS-Cache konnte nicht schreiben:", str(e))
+            return
+
+        with self.lock:
+            self.disk_bytes += len(audio)
+            over_limit = self.disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Delete the oldest files until the directory is back under 90 % of its limit
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith(".audio")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        target = self.max_disk_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+                with self.lock:
+                    self.stats["evictions"] += 1
+            except OSError:
+                continue
+        with self.lock:
+            self.disk_bytes = total
@@ -0,0 +1,91 @@
+import asyncio
+import re
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+# Words whose trailing dot does not end a sentence
+ABBREVIATIONS = {"z.b.", "d.h.", "u.a.", "bzw.", "ca.", "dr.", "nr.", "str.", "usw.", "vgl.", "e.g.", "i.e.", "etc.", "mr.", "mrs."}
+
+# Sentence end: punctuation (plus closing quotes/brackets) followed by whitespace, or a line break
+SENTENCE_END = re.compile(r"[.!?]+[\"'»)\]]*(?=\s)|\n+")
+
+
+class SentenceSplitter:
+    """
+    Cuts a stream of text deltas into sentences as soon as they are complete.
+    A sentence is only emitted once the whitespace after its punctuation has arrived,
+    so dots inside links, numbers and abbreviations do not cut it early.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self.buffer += delta
+        sentences = []
+        search_from = 0
+        while True:
+            match = SENTENCE_END.search(self.buffer, search_from)
+            if not match:
+                break
+            if not self._is_sentence_end(match):
+                search_from = match.end()
+                continue
+            sentence = self.buffer[:match.end()].strip()
+            self.buffer = self.buffer[match.end():]
+            search_from = 0
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        # Whatever is left once the text stream has ended
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+    def _is_sentence_end(self, match) -> bool:
+        if match.group().startswith("\n"):
+            return True
+        words = self.buffer[:match.end()].split()
+        last_word = words[-1].lower() if words else ""
+        if last_word in ABBREVIATIONS:
+            return False
+        # German ordinals and list numbers ("am 7. April", "1. Termin")
+        if match.group() == "." and last_word[:-1].isdigit():
+            return False
+        return True
+
+
+async def synthesize_in_order(
+    sentences: AsyncIterator[str],
+    synthesize: Callable[[str], Awaitable[Optional[bytes]]]
+) -> AsyncIterator[bytes]:
+    """
+    Starts synthesizing every sentence as soon as it arrives, while later text is still being generated,
+    and yields the audio segments in sentence order.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for sentence in sentences:
+                pending.put_nowait(asyncio.ensure_future(synthesize(sentence)))
+        finally:
+            pending.put_nowait(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            task = await pending.get()
+            if task is None:
+                break
+            audio = await task
+            if audio:
+                yield audio
+        # Surface errors of the text stream
+        await producer
+    finally:
+        producer.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not None:
+                task.cancel()
@@ -1,6 +1,7 @@
 import asyncio
+import json
 import websockets
-import base64
+from tools.protocol import PROTOCOL_VERSION, decode_audio_frame
 
 # Path to the local audio file
 AUDIO_PATH = "test_audio.wav"
@@ -15,21 +16,39 @@ async def send_audio():
         audio_bytes = audio_file.read()
 
     async with websockets.connect(SERVER_URI) as websocket:
+        # Announce protocol v1 to get binary audio frames instead of Base64
+        await websocket.send(json.dumps({"type": "hello", "version": PROTOCOL_VERSION}))
+        hello = json.loads(await websocket.recv())
+        print(f"🤝 Connected, session {hello['session_id']}")
+
         print("🎙️ Sending audio to server...")
         await websocket.send(audio_bytes)
 
-        # Wait for the server's response (Base64 encoded MP3)
-        response = await websocket.recv()
-        print("🔊 Response received!")
-
-        # Decode and save the response
-        try:
-            audio_data = base64.b64decode(response)
-            with open(OUTPUT_PATH, "wb") as out_file:
-                out_file.write(audio_data)
-            print(f"✅ Response saved as: {OUTPUT_PATH}")
-        except Exception as e:
-            print("❌ Error decoding the response:", e)
+        # Collect the reply segments until the server closes the turn
+        segments = {}
+        while True:
+            frame = await websocket.recv()
+            if isinstance(frame, bytes):
+                _turn, seq, audio = decode_audio_frame(frame)
+                segments[seq] = audio
+                continue
+
+            message = json.loads(frame)
+            if message["type"] == "transcript":
+                print("📝 Transcript:", message["text"])
+            elif message["type"] == "timing":
+                print("⏱️ Timing:", {k: v for k, v in message.items() if k.endswith("_ms")})
+            elif message["type"] == "error":
+                print(f"❌ Error ({message['code']}):", message["message"])
+                return
+            elif message["type"] == "status" and message["state"] == "done":
+                break
+
+        # Save the segments in order
+        with open(OUTPUT_PATH, "wb") as out_file:
+            for seq in sorted(segments):
+                out_file.write(segments[seq])
+        print(f"✅ Response ({len(segments)} segments) saved as: {OUTPUT_PATH}")
 
 if __name__ == "__main__":
     asyncio.run(send_audio())
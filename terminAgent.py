@@ -13,14 +13,20 @@ import asyncio
 # 🔑 Scopes für den Kalenderzugriff
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
+# Einmal geladen für den ganzen Prozess, statt bei jedem Tool-Aufruf token.json zu lesen
+_creds = None
+_service = None
+
 def authenticate():
-    print("TRY")
-    creds = None
+    global _creds, _service
+    if _creds and _creds.valid:
+        return _creds
+    creds = _creds
     script_dir = os.path.dirname(os.path.abspath(__file__))
     credentials_path = os.path.join(script_dir, 'credentials.json')
 
     # Token-Datei prüfen
-    if os.path.exists("token.json"):
+    if creds is None and os.path.exists("token.json"):
         creds = Credentials.from_authorized_user_file("token.json", SCOPES)
 
     # Wenn keine gültigen Anmeldeinformationen vorliegen
@@ -37,8 +43,21 @@ def authenticate():
         # Token speichern
         with open("token.json", "w") as token:
             token.write(creds.to_json())
+    if creds is not _creds:
+        _service = None  # Neue Credentials, Service neu bauen
+    _creds = creds
     return creds
 
+def calendar_service():
+    # Der Service wird nur einmal gebaut; die Credentials werden bei Bedarf erneuert
+    global _service
+    creds = authenticate()
+    if not creds:
+        return None
+    if _service is None:
+        _service = build("calendar", "v3", credentials=creds, static_discovery=True, cache_discovery=False)
+    return _service
+
 # 📅 Model für Erinnerungen
 class ReminderModel(BaseModel):
     method: str = Field(..., description="Methode der Erinnerung (email, popup)")
@@ -90,12 +109,10 @@ def modify_event(params: ModifyEventParams) -> str:
     """
     Ändert ein bestehendes Ereignis im Google Kalender basierend auf einem Suchbegriff im Titel und einem Zeitraum.
     """
-    creds = authenticate()
-    if not creds:
+    service = calendar_service()
+    if not service:
         return "Authentifizierung fehlgeschlagen."
 
-    service = build("calendar", "v3", credentials=creds)
-
     try:
         start_time = params.start_time + "Z"
         end_time = params.end_time + "Z"
@@ -182,12 +199,10 @@ def create_final_event(event: EventDetails) -> str:
     """
     Erstellt ein neues Ereignis im Google Kalender.
     """
-    creds = authenticate()
-    if not creds:
+    service = calendar_service()
+    if not service:
         return "Authentifizierung fehlgeschlagen."
 
-    service = build("calendar", "v3", credentials=creds)
-
     try:
         event_body = {
             'summary': event.summary,
@@ -217,12 +232,10 @@ def list_events(params: EventListParams) -> str:
     """
     Listet Ereignisse im angegebenen Zeitraum auf, optional gefiltert nach Farbe, Titel und Anzahl.
     """
-    creds = authenticate()
-    if not creds:
+    service = calendar_service()
+    if not service:
         return "Authentifizierung fehlgeschlagen."
 
-    service = build("calendar", "v3", credentials=creds)
-
     try:
         start_time = params.start_time + "Z"
         end_time = params.end_time + "Z"
@@ -252,12 +265,10 @@ def delete_event(params: DeleteEventParams) -> str:
     """
     Löscht ein Ereignis im Google Kalender basierend auf einem Suchbegriff im Titel und einem Zeitraum.
     """
-    creds = authenticate()
-    if not creds:
+    service = calendar_service()
+    if not service:
         return "Authentifizierung fehlgeschlagen."
 
-    service = build("calendar", "v3", credentials=creds)
-
     try:
         start_time = params.start_time + "Z"
         end_time = params.end_time + "Z"